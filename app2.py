@@ -1,9 +1,31 @@
-import xmlrpc.client
-import csv
 import os
+import argparse
+import signal
+import threading
 import time
 from dotenv import load_dotenv
-from get_ids import get_country_id, get_state_id, get_existing_contacts
+from pipeline import log_result
+from import_engine import STRATEGIES, import_file
+from import_plan import build_plan, apply_plan, log_plan_summary
+from row_report import RowReport
+from input_stream import input_exists
+from local_cache import LocalCache
+from fingerprints import FingerprintStore
+from watch_folder import ImportSession, watch_folder
+from fan_out import (
+    fan_out,
+    import_parsed,
+    parse_contacts,
+    read_targets,
+    target_file_name,
+)
+from resilient_rpc import AdaptiveLimiter, CircuitBreaker
+from instrumentation import (
+    MeteredServerProxy,
+    start_progress,
+    transport_settings,
+    write_reports,
+)
 import logging
 
 load_dotenv()
@@ -13,198 +35,501 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# Importa dados do CSV e retorna uma lista de contatos
-def import_csv_contacts(file_name):
-    logger.info(f"Diretório atual: {os.getcwd()}")
-
-    if not os.path.isfile(file_name):
-        logger.error(f"Arquivo '{file_name}' não encontrado no diretório atual.")
-        return
-
+# Autentica o usuário no Odoo (ou usa o uid salvo no cache local)
+def authenticate(url, db, username, password, cache=None):
     try:
-        with open(file_name, mode="r", newline="", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-
-            contacts = []
-            invalid_contacts = []
-
-            # Controle para evitar duplicatas no CSV
-            seen_names = set()
-            seen_emails = set()
-
-            logger.info("\nRegistros válidos do arquivo:")
-
-            for row_index, row in enumerate(reader, start=1):
-                contact_name = (row.get("Nome completo") or "").strip()
-                contact_email = (row.get("E-mail") or "").strip()
-
-                # Verifica duplicatas no CSV
-                if contact_name in seen_names or contact_email in seen_emails:
-                    continue
-
-                seen_names.add(contact_name)
-                seen_emails.add(contact_email)
-
-                contact = {
-                    "name": contact_name,
-                    "email": contact_email,
-                    "function": (row.get("Cargo") or "").strip(),
-                    "company_name": (row.get("Nome da empresa") or "").strip(),
-                    "city": (row.get("Cidade") or "").strip(),
-                    "country_id": (row.get("País") or "").strip(),
-                    "state_id": (row.get("Estado") or "").strip(),
-                    "street": (row.get("Localização") or "").strip(),
-                    "website": (row.get("LinkedIn") or "").strip(),
-                    "x_redes_sociais": (
-                        row.get("Usuário - redes sociais") or ""
-                    ).strip(),
-                    "x_setor": (row.get("Setor") or "").strip(),
-                    "x_info_empresa": f"""
-                        Nome: {(row.get("Nome da empresa") or "").strip()}
-                        Localização: {(row.get("Localização da empresa") or "").strip()}
-                        Telefone da sede: {(row.get("Telefone da sede") or "").strip()}
-                        Setor: {(row.get("Setor da empresa") or "").strip()}
-                        Tamanho: {(row.get("Tamanho da empresa") or "").strip()}
-                        URL: {(row.get("URL da empresa") or "").strip()}
-                        Redes Sociais: {(row.get("Empresa - redes sociais") or "").strip()}
-                    """,
-                }
-
-                if not contact["name"] or not contact["email"]:
-                    invalid_contacts.append(
-                        f"Registro {row_index}, {contact['name']}, {contact['email']}"
-                    )
-                    continue
-
-                logger.info(
-                    f"Registro {row_index}, Nome: {contact['name']}, Email: {contact['email']}"
-                )
-                contacts.append(contact)
-
-            if invalid_contacts:
-                logger.warning("\nRegistros inválidos:")
-                for i in invalid_contacts:
-                    logger.warning(i)
-
-            return contacts
-
-    except Exception as e:
-        logger.error(f"Erro ao carregar o arquivo: {e}")
+        key = cache.auth_key(username, password) if cache else None
+        uid = cache.get(key) if cache else None
+        if uid:
+            return uid
 
-
-# Autentica o usuário no Odoo
-def authenticate(url, db, username, password):
-    try:
-        common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
+        common = MeteredServerProxy(f"{url}/xmlrpc/2/common")
         uid = common.authenticate(db, username, password, {})
 
         if not uid:
             raise ValueError("Falha na autenticação. Verifique as credenciais.")
+        if cache:
+            cache.set(key, uid)
         return uid
 
     except Exception as e:
         logger.error(f"Erro ao autenticar: {e}")
 
 
-# Verifica se o contato já existe no Odoo
-def contact_exists_odoo(existing_contacts, contact):
-    return contact["name"] in existing_contacts or contact["email"] in existing_contacts
+# Configuração do importador lida do ambiente
+def import_settings():
+    return {
+        # Default para 500 contatos por lote (um único RPC por lote)
+        "batch_size": int(os.getenv("BATCH_SIZE", 500)),
+        # Snapshot dos contatos existentes salvo em disco (sincronização incremental)
+        "snapshot_file": os.getenv("PARTNER_SNAPSHOT_FILE"),
+        "page_size": int(os.getenv("SNAPSHOT_PAGE_SIZE", 5000)),
+        # Leitura do CSV em paralelo (processos) para arquivos muito grandes
+        "parse_workers": int(os.getenv("PARSE_WORKERS", 1)),
+        "parse_chunk_size": int(os.getenv("PARSE_CHUNK_SIZE", 4 << 20)),
+        # Comparação de duplicados: exact, normalized (padrão) ou fuzzy
+        "match_mode": os.getenv("MATCH_MODE", "normalized"),
+        # Busca dos duplicados no Odoo: auto (padrão), snapshot ou targeted. A busca
+        # só dos contatos do CSV (targeted, ou auto com CSV pequeno e base grande)
+        # exige MATCH_MODE=exact: com normalized (o padrão) e fuzzy os contatos
+        # existentes são sempre baixados inteiros (snapshot)
+        "lookup": os.getenv("DEDUPE_LOOKUP", "auto"),
+    }
+
+
+# Controle de taxa dos RPCs de escrita
+def rate_control(strategy, batch_size, max_workers):
+    limiter = None
+    if os.getenv("ADAPTIVE", "1") == "1":
+        target_latency = float(os.getenv("RPC_TARGET_LATENCY", 5.0))
+        if strategy == "batch-create":
+            # Tamanho de lote adaptativo (AIMD): BATCH_SIZE é só o ponto de partida
+            limiter = AdaptiveLimiter(
+                batch_size=batch_size,
+                max_batch_size=int(os.getenv("BATCH_SIZE_MAX", 2000)),
+                target_latency=target_latency,
+            )
+        elif strategy == "threads":
+            # Concorrência adaptativa (AIMD): MAX_WORKERS é só o teto
+            limiter = AdaptiveLimiter(
+                concurrency=min(4, max_workers),
+                max_concurrency=max_workers,
+                target_latency=target_latency,
+            )
+    return limiter, CircuitBreaker()
+
+
+# Opções da importação: configuração do ambiente, estratégia e controle de taxa
+def import_options(strategy, upsert=False, companies=False, cache=None):
+    settings = import_settings()
+    # Threads ou chamadas simultâneas das estratégias threads e async
+    max_workers = int(os.getenv("MAX_WORKERS", 10))
+    # Contatos lidos à frente dos envios em andamento (backpressure)
+    queue_size = int(os.getenv("QUEUE_SIZE", max_workers * 2))
+    limiter, breaker = rate_control(strategy, settings["batch_size"], max_workers)
+    return {
+        "strategy": strategy,
+        "max_workers": max_workers,
+        "queue_size": queue_size,
+        "limiter": limiter,
+        "breaker": breaker,
+        "upsert": upsert,
+        "companies": companies,
+        "cache": cache,
+        **settings,
+    }
+
+
+# Importa o CSV em streaming com a estratégia escolhida: os contatos chegam ao
+# Odoo enquanto o arquivo é lido
+def import_contacts(
+    url,
+    db,
+    uid,
+    password,
+    file_name,
+    resume=False,
+    report=log_result,
+    upsert=False,
+    companies=False,
+    cache=None,
+    strategy="batch-create",
+    fingerprint_file=None,
+):
+    logger.info(f"Diretório atual: {os.getcwd()}")
 
+    if not input_exists(file_name):
+        logger.error(f"Arquivo '{file_name}' não encontrado no diretório atual.")
+        return
 
-# Cache para country_id e state_id
-country_cache = {}
-state_cache = {}
+    options = import_options(strategy, upsert, companies, cache)
 
+    # Importação delta: só as linhas novas ou alteradas desde a última importação
+    fingerprints = None
+    if fingerprint_file:
+        fingerprints = FingerprintStore(fingerprint_file, url, db, upsert, companies)
 
-def get_country_id_cached(models, db, uid, password, country_name):
-    if country_name in country_cache:
-        return country_cache[country_name]
+    try:
+        total = import_file(
+            url,
+            db,
+            uid,
+            password,
+            file_name,
+            report=report,
+            resume=resume,
+            fingerprints=fingerprints,
+            **options,
+        )
+        if fingerprints:
+            logger.info(
+                f"Registros sem alterações desde a última importação: "
+                f"{fingerprints.skipped}"
+            )
+        logger.info(f"Total de contatos enviados ao Odoo: {total}")
 
-    country_id = get_country_id(models, db, uid, password, country_name)
-    if country_id:
-        country_cache[country_name] = country_id
+    except Exception as e:
+        logger.error(f"Erro ao importar contatos: {e}")
+
+    finally:
+        # as linhas que chegaram ao Odoo ficam registradas mesmo após um erro
+        if fingerprints:
+            fingerprints.save()
+
+
+# Modo daemon: importa cada CSV que chega na pasta, com a sessão, as tabelas de
+# referência e o índice de duplicados mantidos em memória entre os arquivos
+def watch_contacts(
+    url,
+    db,
+    uid,
+    password,
+    folder,
+    upsert=False,
+    companies=False,
+    cache=None,
+    strategy="batch-create",
+    fingerprint_file=None,
+):
+    if not os.path.isdir(folder):
+        logger.error(f"Pasta '{folder}' não encontrada.")
+        return
 
-    return country_id
+    options = import_options(strategy, upsert, companies, cache)
+    session = ImportSession(
+        url, db, uid, password, options["match_mode"], options["page_size"]
+    )
+    session.load(cache)
 
+    fingerprints = None
+    if fingerprint_file:
+        fingerprints = FingerprintStore(fingerprint_file, url, db, upsert, companies)
 
-def get_state_id_cached(models, db, uid, password, country_id, state_name):
-    state_cache_key = (country_id, state_name)
-    if state_cache_key in state_cache:
-        return state_cache[state_cache_key]
+    # SIGTERM (systemd, docker stop) encerra após o arquivo em andamento
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        watch_folder(
+            session,
+            folder,
+            options,
+            float(os.getenv("WATCH_INTERVAL", 5)),
+            stop,
+            fingerprints,
+        )
+    except KeyboardInterrupt:
+        pass
+    logger.info("Modo daemon encerrado")
+
+
+# Importa o mesmo CSV em vários bancos ao mesmo tempo: o arquivo é lido e validado
+# uma única vez e cada destino tem a sua sessão, tabelas de referência, índice de
+# duplicados, controle de taxa, cache, snapshot e relatório (arquivo.<destino>.ext)
+def fan_out_contacts(
+    file_name,
+    env_files,
+    report_file=None,
+    upsert=False,
+    companies=False,
+    cache_file=None,
+    refresh_cache=False,
+):
+    if not input_exists(file_name):
+        logger.error(f"Arquivo '{file_name}' não encontrado no diretório atual.")
+        return
 
-    state_id = get_state_id(models, db, uid, password, country_id, state_name)
-    if state_id:
-        state_cache[state_cache_key] = state_id
+    try:
+        targets = read_targets(env_files)
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao ler os destinos: {e}")
+        return
+
+    settings = import_settings()
+    contacts, rejected = parse_contacts(
+        file_name,
+        settings["match_mode"],
+        settings["parse_workers"],
+        settings["parse_chunk_size"],
+    )
+    logger.info(
+        f"{len(contacts)} contatos válidos, importando em {len(targets)} bancos"
+    )
+
+    def import_target(target):
+        name = target["name"]
+        url = target["url"]
+        db = target["db"]
+
+        # uma conexão sqlite por thread; as entradas já são separadas por banco
+        cache = LocalCache(cache_file, url, db) if cache_file else None
+        try:
+            if cache and refresh_cache:
+                cache.clear()
+            uid = authenticate(url, db, target["username"], target["password"], cache)
+            if not uid:
+                raise ValueError("Falha na autenticação")
+
+            options = import_options("batch-create", upsert, companies, cache)
+            with RowReport(
+                target_file_name(report_file, target),
+                log=lambda message: logger.info(f"[{name}] {message}"),
+            ) as report:
+                total = import_parsed(
+                    url,
+                    db,
+                    uid,
+                    target["password"],
+                    file_name,
+                    contacts,
+                    rejected,
+                    options["batch_size"],
+                    report,
+                    target_file_name(options["snapshot_file"], target),
+                    options["page_size"],
+                    options["limiter"],
+                    options["breaker"],
+                    upsert,
+                    companies,
+                    cache,
+                    options["match_mode"],
+                    options["lookup"],
+                )
+            logger.info(f"[{name}] Total de contatos enviados ao Odoo: {total}")
+            return total
+        finally:
+            if cache:
+                cache.close()
+
+    results = fan_out(targets, import_target)
+    failed = [name for name, result in results.items() if isinstance(result, Exception)]
+    if failed:
+        logger.error(f"Destinos com erro: {', '.join(failed)}")
+
+
+# Calcula o plano da importação sem escrever nada no Odoo e o salva em plan_file
+def plan_contacts(
+    url, db, uid, password, file_name, plan_file, report=None, upsert=False,
+    cache=None, companies=False,
+):
+    if not input_exists(file_name):
+        logger.error(f"Arquivo '{file_name}' não encontrado no diretório atual.")
+        return
 
-    return state_id
+    try:
+        summary = build_plan(
+            url,
+            db,
+            uid,
+            password,
+            file_name,
+            plan_file,
+            report=report,
+            upsert=upsert,
+            cache=cache,
+            companies=companies,
+            **import_settings(),
+        )
+        log_plan_summary(summary)
+        logger.info(f"Plano salvo em {plan_file}")
 
+    except Exception as e:
+        logger.error(f"Erro ao calcular o plano: {e}")
 
-# Divide os contatos em lotes menores
-def create_contacts_in_batches(contacts, batch_size):
-    for i in range(0, len(contacts), batch_size):
-        yield contacts[i : i + batch_size]
 
+# Aplica um plano salvo, sem ler o CSV nem recalcular nada: os lotes e as
+# empresas (--companies) são os do plano
+def apply_contacts_plan(url, db, uid, password, plan_file, report=log_result):
+    if not os.path.isfile(plan_file):
+        logger.error(f"Plano '{plan_file}' não encontrado.")
+        return
 
-# Cria os contatos no Odoo
-def create_contacts(url, db, uid, password, contacts):
     try:
-        models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
-        existing_contacts = get_existing_contacts(models, db, uid, password)
-        existing_contacts_set = {(c["name"], c["email"]) for c in existing_contacts}
-
-        batch_size = int(
-            os.getenv("BATCH_SIZE", 50)
-        )  # Default para 50 contatos por lote
-
-        for batch in create_contacts_in_batches(contacts, batch_size):
-            for contact in batch:
-                try:
-                    if contact_exists_odoo(existing_contacts_set, contact):
-                        logger.info(
-                            f"{contact['name']} ou o email {contact['email']} já existe no banco de dados."
-                        )
-                        continue
-
-                    country_id = get_country_id_cached(
-                        models, db, uid, password, contact["country_id"]
-                    )
-                    state_id = get_state_id_cached(
-                        models, db, uid, password, country_id, contact["state_id"]
-                    )
-
-                    contact["state_id"] = state_id or ""
-                    contact["country_id"] = country_id or ""
-
-                    contact_id = models.execute_kw(
-                        db, uid, password, "res.partner", "create", [contact]
-                    )
-                    logger.info(f"{contact['name']} criado com o ID: {contact_id}")
-
-                except Exception as e:
-                    logger.error(f"Erro ao criar contato {contact['name']}: {e}")
+        total = apply_plan(
+            url, db, uid, password, plan_file, report, CircuitBreaker()
+        )
+        logger.info(f"Total de contatos enviados ao Odoo: {total}")
 
     except Exception as e:
-        logger.error(f"Erro ao criar contatos: {e}")
+        logger.error(f"Erro ao aplicar o plano: {e}")
+
+
+# Executa o modo escolhido na linha de comando
+def run(args, url, db, uid, password, report=None, cache=None):
+    if args.watch:
+        watch_contacts(
+            url, db, uid, password, args.watch, args.upsert, args.companies, cache,
+            args.strategy, args.fingerprints,
+        )
+    elif args.plan:
+        plan_contacts(
+            url, db, uid, password, args.file_name, args.plan, report, args.upsert,
+            cache, args.companies,
+        )
+    elif args.apply_plan:
+        apply_contacts_plan(
+            url, db, uid, password, args.apply_plan, report or log_result
+        )
+    else:
+        import_contacts(
+            url, db, uid, password, args.file_name, args.resume,
+            report or log_result, args.upsert, args.companies, cache,
+            args.strategy, args.fingerprints,
+        )
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Importa contatos de um CSV no Odoo",
+        epilog="Duplicados: MATCH_MODE (exact, normalized ou fuzzy) e DEDUPE_LOOKUP "
+        "(auto, snapshot ou targeted). A busca só dos contatos do CSV, em vez de "
+        "baixar todos os existentes, exige MATCH_MODE=exact.",
+    )
+    parser.add_argument(
+        "file_name",
+        nargs="?",
+        default="test.csv",
+        help="CSV a importar, também comprimido (.gz, .bz2, .xz, .zst), ou - para "
+        "ler da entrada padrão",
+    )
+    parser.add_argument(
+        "--strategy",
+        choices=STRATEGIES,
+        default=os.getenv("IMPORT_STRATEGY", "batch-create"),
+        help="como os contatos são enviados: um por RPC (serial, threads, async) "
+        "ou em lotes (batch-create, padrão)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="retoma a partir do último lote registrado no arquivo .checkpoint",
+    )
+    parser.add_argument(
+        "--report",
+        default=os.getenv("ROW_REPORT_FILE"),
+        help="salva os registros criados, duplicados e rejeitados em .csv ou .ndjson",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        default=os.getenv("QUIET") == "1",
+        help="sem log por registro, apenas um resumo periódico no console",
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        default=os.getenv("UPSERT") == "1",
+        help="atualiza os campos alterados dos contatos que já existem no Odoo",
+    )
+    parser.add_argument(
+        "--companies",
+        action="store_true",
+        default=os.getenv("COMPANIES") == "1",
+        help="cria as empresas como parceiros e vincula os contatos (parent_id)",
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="ARQUIVO",
+        help="calcula o plano da importação sem escrever no Odoo e o salva",
+    )
+    parser.add_argument(
+        "--apply-plan",
+        metavar="ARQUIVO",
+        help="aplica um plano salvo com --plan, sem ler o CSV novamente",
+    )
+    parser.add_argument(
+        "--watch",
+        metavar="PASTA",
+        default=os.getenv("WATCH_FOLDER"),
+        help="modo daemon: importa cada CSV que chegar na pasta (WATCH_INTERVAL)",
+    )
+    parser.add_argument(
+        "--fingerprints",
+        metavar="ARQUIVO",
+        default=os.getenv("FINGERPRINT_FILE"),
+        help="importa só as linhas novas ou alteradas desde a última importação",
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        metavar="ARQUIVO",
+        default=[name for name in os.getenv("ODOO_TARGETS", "").split(",") if name],
+        help="importa o CSV em vários bancos ao mesmo tempo, um arquivo .env "
+        "(ODOO_URL, ODOO_DB...) por banco",
+    )
+    parser.add_argument(
+        "--cache",
+        default=os.getenv("ODOO_CACHE_FILE"),
+        help="cache local (sqlite) do uid, países, estados e contatos existentes",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="descarta o cache local deste servidor e banco antes de importar",
+    )
+    args = parser.parse_args()
+
+    # Pedidos XML-RPC comprimidos com gzip (só atrás de um proxy que os descomprima)
+    if os.getenv("RPC_GZIP") == "1":
+        transport_settings["gzip_min_size"] = int(os.getenv("RPC_GZIP_MIN_SIZE", 1024))
+        transport_settings["gzip_level"] = int(os.getenv("RPC_GZIP_LEVEL", 1))
+    if args.targets and (
+        args.resume or args.watch or args.plan or args.apply_plan or args.fingerprints
+    ):
+        parser.error(
+            "--targets não combina com --resume, --watch, --plan, --apply-plan "
+            "nem --fingerprints"
+        )
+    # Cada destino importa em lotes (batch-create), com o seu próprio controle de taxa
+    if args.targets and args.strategy != "batch-create":
+        parser.error("--targets só funciona com a estratégia batch-create")
+
+    # Vários bancos: cada destino autentica com as suas próprias credenciais
+    if args.targets:
+        fan_out_contacts(
+            args.file_name, args.targets, args.report, args.upsert, args.companies,
+            args.cache, args.refresh_cache,
+        )
+        return
+
     # Credenciais do Odoo
     odoo_url = os.getenv("ODOO_URL")
     odoo_db = os.getenv("ODOO_DB")
     odoo_username = os.getenv("ODOO_USERNAME")
     odoo_password = os.getenv("ODOO_PASSWORD")
 
-    uid = authenticate(odoo_url, odoo_db, odoo_username, odoo_password)
-    if uid:
-        contacts = import_csv_contacts("test.csv")
+    # Cache local: execuções seguidas quase não fazem RPCs de preparação
+    cache = LocalCache(args.cache, odoo_url, odoo_db) if args.cache else None
+    if cache and args.refresh_cache:
+        cache.clear()
 
-        if contacts:
-            logger.info(f"\nTotal de contatos para serem carregados: {len(contacts)}\n")
-            create_contacts(odoo_url, odoo_db, uid, odoo_password, contacts)
+    try:
+        uid = authenticate(odoo_url, odoo_db, odoo_username, odoo_password, cache)
+        if not uid:
+            return
 
+        # Modo silencioso: os registros vão para o relatório, não para o console
+        if args.quiet or args.report:
+            with RowReport(args.report) as report:
+                run(args, odoo_url, odoo_db, uid, odoo_password, report, cache)
+        else:
+            run(args, odoo_url, odoo_db, uid, odoo_password, cache=cache)
+    finally:
+        if cache:
+            cache.close()
 
-if __name__ == "__main__":
+
+# Ponto de entrada da linha de comando (também usado por app.py e app1.py)
+def cli():
     start_time = time.time()
+    # Linha de progresso opcional a cada PROGRESS_INTERVAL segundos
+    stop_progress = start_progress(float(os.getenv("PROGRESS_INTERVAL", 0)))
     main()
+    stop_progress()
+    # Métricas da execução (latência e bytes por RPC, caches, registros/s por etapa)
+    write_reports(os.getenv("METRICS_JSON"), os.getenv("METRICS_PROMETHEUS"))
     elapsed_time = time.time() - start_time
     logger.info(f"Tempo de execução: {elapsed_time:.2f} segundos")
+
+
+if __name__ == "__main__":
+    cli()
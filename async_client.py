@@ -0,0 +1,248 @@
+import asyncio
+import itertools
+import json
+import ssl
+import threading
+import xmlrpc.client
+from urllib.parse import urlsplit
+
+
+# read an HTTP/1.1 response and return (status, reason, headers, body)
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Conexão fechada pelo servidor")
+
+    version, status, reason = (
+        status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+    )
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    # HTTP/1.0 servers close the connection unless they say otherwise
+    if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+        headers["connection"] = "close"
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if not size:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        headers["connection"] = "close"
+
+    return int(status), reason, headers, body
+
+
+# asyncio client for the odoo external api over /jsonrpc or /xmlrpc/2.
+# Keeps a pool of keep-alive connections and a semaphore that caps the number of
+# requests in flight, so one process can keep hundreds of calls going at once.
+class AsyncOdooClient:
+    def __init__(self, url, db, protocol="jsonrpc", max_in_flight=100):
+        if protocol not in ("jsonrpc", "xmlrpc"):
+            raise ValueError(f"Protocolo desconhecido: {protocol}")
+
+        parts = urlsplit(url)
+        self.url = url
+        self.db = db
+        self.protocol = protocol
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.base_path = parts.path.rstrip("/")
+        self.uid = None
+        self.password = None
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._idle_connections = []
+        self._request_ids = itertools.count(1)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # close every idle connection of the pool
+    async def close(self):
+        while self._idle_connections:
+            _, writer = self._idle_connections.pop()
+            writer.close()
+
+    # send one POST, reusing an idle connection when there is one
+    async def _post(self, path, body, content_type):
+        request = (
+            f"POST {self.base_path}{path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1") + body
+
+        async with self._semaphore:
+            while True:
+                reused = bool(self._idle_connections)
+                if reused:
+                    reader, writer = self._idle_connections.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(
+                        self.host, self.port, ssl=self.ssl
+                    )
+
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    status, reason, headers, response = await _read_response(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # the server may have dropped an idle keep-alive connection
+                    if reused:
+                        continue
+                    raise
+
+                if headers.get("connection", "").lower() == "close":
+                    writer.close()
+                else:
+                    self._idle_connections.append((reader, writer))
+
+                if status != 200:
+                    raise xmlrpc.client.ProtocolError(
+                        f"{self.url}{path}", status, reason, headers
+                    )
+                return response
+
+    # call a method of an odoo service ("common" or "object")
+    async def call(self, service, method, *args):
+        if self.protocol == "xmlrpc":
+            body = xmlrpc.client.dumps(args, method, allow_none=True).encode("utf-8")
+            response = await self._post(f"/xmlrpc/2/{service}", body, "text/xml")
+            return xmlrpc.client.loads(response, use_builtin_types=True)[0][0]
+
+        payload = {
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": service, "method": method, "args": list(args)},
+            "id": next(self._request_ids),
+        }
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        response = json.loads(await self._post("/jsonrpc", body, "application/json"))
+
+        # surface json-rpc errors the same way xmlrpc.client does
+        if response.get("error"):
+            error = response["error"]
+            message = (error.get("data") or {}).get("message") or error.get("message")
+            raise xmlrpc.client.Fault(error.get("code", 1), message)
+        return response.get("result")
+
+    # authenticate and keep the uid and password for the next calls
+    async def authenticate(self, username, password):
+        uid = await self.call("common", "authenticate", self.db, username, password, {})
+        if not uid:
+            raise ValueError("Falha na autenticação. Verifique as credenciais.")
+
+        self.uid = uid
+        self.password = password
+        return uid
+
+    async def execute_kw(self, model, method, args, kwargs=None):
+        return await self.call(
+            "object", "execute_kw", self.db, self.uid, self.password,
+            model, method, args, kwargs or {},
+        )
+
+    async def search_read(self, model, domain, fields, **kwargs):
+        return await self.execute_kw(
+            model, "search_read", [domain], {"fields": fields, **kwargs}
+        )
+
+    async def create(self, model, vals):
+        return await self.execute_kw(model, "create", [vals])
+
+
+# the items of a plain iterable as an async iterable
+async def _as_async(items):
+    for item in items:
+        yield item
+
+
+# iterate items (a blocking generator: csv reading, rpcs...) on a worker thread
+# and yield them on the event loop through a queue of queue_size, so the loop
+# keeps the calls in flight while the next items are produced. An error of the
+# generator is raised here.
+async def iterate_in_thread(items, queue_size):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(entry):
+        asyncio.run_coroutine_threadsafe(queue.put(entry), loop).result()
+
+    # every item goes as (item,), then None at the end or the error
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                put((item,))
+            put(None)
+        except Exception as e:
+            put(e)
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    try:
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                break
+            if isinstance(entry, Exception):
+                raise entry
+            yield entry[0]
+    finally:
+        stop.set()
+        # free a producer waiting for room in the queue, so it sees the stop
+        while not producer.done():
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.wait({producer}, timeout=0.1)
+
+
+# await func(item) for every item (an iterable or an async iterable) with at most
+# limit coroutines alive at once, yielding (item, result, error) as they finish
+async def gather_bounded(func, items, limit=100):
+    pending = set()
+    if not hasattr(items, "__aiter__"):
+        items = _as_async(items)
+
+    # run one call and keep the item together with its result or error
+    async def run(item):
+        try:
+            return item, await func(item), None
+        except Exception as e:
+            return item, None, e
+
+    async for item in items:
+        if len(pending) >= limit:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+        pending.add(asyncio.ensure_future(run(item)))
+
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
@@ -0,0 +1,180 @@
+from resilient_rpc import is_retryable, was_rejected
+
+
+# create a chunk of partners with a single "create" rpc and map the returned ids
+# back to the contacts. If the chunk fails it is split in half and each half is
+# retried, so one bad row only loses itself instead of the whole chunk. Transient
+# errors (already retried by the rpc layer) fail the chunk without splitting it,
+# except a lost response, after which the chunk is checked once by email
+# (recover_created). Returns a list of (contact, partner_id, error) tuples in the
+# input order.
+def create_partners_batch(models, db, uid, password, contacts, rechecked=False):
+    if not contacts:
+        return []
+
+    try:
+        # the partner dicts are only built here, right before they are sent
+        partner_ids = models.execute_kw(
+            db, uid, password, "res.partner", "create",
+            [[contact.to_dict() for contact in contacts]],
+        )
+    except Exception as e:
+        if is_retryable(e) and not was_rejected(e) and not rechecked:
+            return recover_created(models, db, uid, password, contacts, e)
+        if len(contacts) == 1 or is_retryable(e):
+            return [(contact, False, e) for contact in contacts]
+
+        middle = len(contacts) // 2
+        return create_partners_batch(
+            models, db, uid, password, contacts[:middle], rechecked
+        ) + create_partners_batch(
+            models, db, uid, password, contacts[middle:], rechecked
+        )
+
+    # older Odoo versions return a single id when a single dict is created
+    if not isinstance(partner_ids, list):
+        partner_ids = [partner_ids]
+
+    return [
+        (contact, partner_id, None)
+        for contact, partner_id in zip(contacts, partner_ids)
+    ]
+
+
+# after a create whose response was lost (reset, timeout, 502/504) the server may
+# have committed it: look the contacts up by email, report the ones found as
+# created and send only the missing ones again, so a lost response never creates
+# the chunk twice. The contacts passed the dedupe, so their emails were not in
+# odoo before the create.
+def recover_created(models, db, uid, password, contacts, error):
+    try:
+        partners = models.execute_kw(
+            db, uid, password, "res.partner", "search_read",
+            [[("email", "in", [contact.email for contact in contacts])]],
+            {"fields": ["email"]},
+        )
+    except Exception:
+        return [(contact, False, error) for contact in contacts]
+
+    created = {}
+    for partner in partners:
+        created.setdefault(partner["email"], partner["id"])
+    missing = [contact for contact in contacts if contact.email not in created]
+    resent = iter(
+        create_partners_batch(models, db, uid, password, missing, rechecked=True)
+    )
+    return [
+        (contact, created[contact.email], None)
+        if contact.email in created
+        else next(resent)
+        for contact in contacts
+    ]
+
+
+# partner fields compared and written by the upsert mode. The name and the email
+# are the match keys and are never overwritten.
+UPSERT_FIELDS = [
+    "function",
+    "company_name",
+    "city",
+    "country_id",
+    "state_id",
+    "street",
+    "website",
+    "x_redes_sociais",
+    "x_setor",
+    "x_info_empresa",
+    "parent_id",
+]
+
+
+# value read from odoo as the importer sends it: many2one [id, name] -> id,
+# empty (False) -> ""
+def stored_value(value):
+    if isinstance(value, list):
+        return value[0] if value else ""
+    return value or ""
+
+
+# the fields of the contact that differ from the stored partner. Empty values in
+# the csv never erase what is already in odoo.
+def changed_fields(values, stored):
+    changes = {}
+    for field in UPSERT_FIELDS:
+        value = values.get(field, "")
+        if value not in ("", False) and value != stored_value(stored.get(field)):
+            changes[field] = value
+    return changes
+
+
+# compare a chunk of existing partners (contact.partner_id set by the dedupe step)
+# with their current values, read with one "read" rpc. Nothing is written.
+# Returns a list of (contact, changed_vals, error) tuples in the input order;
+# changed_vals is {} for an unchanged partner.
+def diff_partners_batch(models, db, uid, password, contacts):
+    if not contacts:
+        return []
+
+    try:
+        stored_partners = models.execute_kw(
+            db, uid, password, "res.partner", "read",
+            [[contact.partner_id for contact in contacts]],
+            {"fields": UPSERT_FIELDS},
+        )
+    except Exception as e:
+        return [(contact, None, e) for contact in contacts]
+
+    stored_by_id = {partner["id"]: partner for partner in stored_partners}
+    results = []
+    for contact in contacts:
+        stored = stored_by_id.get(contact.partner_id)
+        if stored is None:
+            # deleted in odoo after the snapshot was taken
+            error = LookupError(f"Parceiro {contact.partner_id} não encontrado")
+            results.append((contact, None, error))
+        else:
+            results.append((contact, changed_fields(contact.to_dict(), stored), None))
+    return results
+
+
+# send the (contact, changed_vals) updates with one write([ids], vals) per distinct
+# vals, so partners with the same changes share a single call.
+# Returns a list of (contact, changed_vals, error) tuples in the input order.
+def write_partner_updates(models, db, uid, password, updates):
+    groups = {}
+    for position, (_, changes) in enumerate(updates):
+        groups.setdefault(tuple(sorted(changes.items())), []).append(position)
+
+    results = [None] * len(updates)
+    for changes, positions in groups.items():
+        partner_ids = [updates[position][0].partner_id for position in positions]
+        error = None
+        try:
+            models.execute_kw(
+                db, uid, password, "res.partner", "write", [partner_ids, dict(changes)]
+            )
+        except Exception as e:
+            error = e
+
+        for position in positions:
+            results[position] = (updates[position][0], dict(changes), error)
+    return results
+
+
+# update a chunk of existing partners: diff them with their stored values and
+# write only the changed fields, grouped, so unchanged partners are not sent at all.
+# Returns a list of (contact, changed_vals, error) tuples in the input order;
+# changed_vals is {} for an unchanged partner.
+def update_partners_batch(models, db, uid, password, contacts):
+    results = diff_partners_batch(models, db, uid, password, contacts)
+    changed = [
+        position for position, (_, changes, error) in enumerate(results)
+        if changes and not error
+    ]
+    written = write_partner_updates(
+        models, db, uid, password,
+        [(results[position][0], results[position][1]) for position in changed],
+    )
+    for position, result in zip(changed, written):
+        results[position] = result
+    return results
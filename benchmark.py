@@ -0,0 +1,326 @@
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contact_index import MATCH_MODES, build_contact_index, find_in_contact_index
+from import_engine import STRATEGIES
+from mock_odoo import MOCK_COUNTRIES, MOCK_STATES, start_mock_server
+
+# columns of the vendor export read by the importer
+CSV_HEADER = [
+    "E-mail", "Status do e-mail", "Nome", "Sobrenome", "Nome completo",
+    "Usuário - redes sociais", "LinkedIn", "Cargo", "País", "Localização", "Setor",
+    "Adicionar data", "Nome da empresa", "URL da empresa", "Empresa - redes sociais",
+    "Tamanho da empresa", "País da empresa", "Localização da empresa", "Estado",
+    "Cidade", "Setor da empresa", "Telefone da sede", "Telefone",
+]
+
+SECTORS = ["Tecnologia", "Saúde", "Varejo", "Educação", "Finanças", "Indústria"]
+
+# syllables of the synthetic names of the matching benchmark (some accented)
+SYLLABLES = [
+    "ba", "be", "ca", "co", "da", "de", "fa", "fi", "ga", "go", "la", "li", "ma",
+    "mo", "na", "ne", "pa", "po", "ra", "ri", "sa", "so", "ta", "tu", "vi", "zé",
+    "ção", "lú", "rê", "mã",
+]
+EMAIL_DOMAINS = [f"empresa{index}.com.br" for index in range(200)] + ["gmail.com"]
+
+# share of the incoming rows of each kind in the matching benchmark; the rest
+# are new people, so every match among them is a false positive
+MATCHING_KINDS = {"same": 0.2, "variant": 0.2, "typo": 0.1}
+
+
+# write a synthetic export with rows contacts and a share of duplicated rows
+def generate_csv(file_name, rows, duplicate_ratio=0.02, seed=42):
+    rng = random.Random(seed)
+    countries = [name for name, _ in MOCK_COUNTRIES] + ["Atlantis"]
+    states = {}
+    for country, state, _ in MOCK_STATES:
+        states.setdefault(country, []).append(state)
+
+    with open(file_name, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+
+        for index in range(rows):
+            # reuse an earlier contact to exercise the duplicate checks
+            if index and rng.random() < duplicate_ratio:
+                index = rng.randrange(index)
+
+            country = countries[index % len(countries)]
+            company = f"Empresa {index % 997}"
+            writer.writerow([
+                f"contato{index}@exemplo{index % 50}.com",
+                "Válido",
+                f"Nome{index}",
+                f"Sobrenome{index}",
+                f"Nome{index} Sobrenome{index}",
+                f"@contato{index}",
+                f"https://linkedin.com/in/contato{index}",
+                "Analista",
+                country,
+                f"Rua {index}, {index % 1000}",
+                SECTORS[index % len(SECTORS)],
+                "2024-01-01",
+                company,
+                f"https://empresa{index % 997}.com",
+                f"@empresa{index % 997}",
+                "51-200",
+                country,
+                f"Avenida {index % 997}",
+                rng.choice(states.get(country, [""])),
+                f"Cidade {index % 300}",
+                SECTORS[index % 997 % len(SECTORS)],
+                f"+55 11 {index % 10000:04d}-0000",
+                f"+55 11 9{index % 10000:04d}-0000",
+            ])
+
+
+# a synthetic person: "Bazélu Ticora" with an email at one of the domains
+def random_person(rng):
+    first = "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+    last = "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+    local = f"{first}.{last}{rng.randrange(100)}".lower()
+    local = local.encode("ascii", "ignore").decode()
+    return {"name": f"{first} {last}", "email": f"{local}@{rng.choice(EMAIL_DOMAINS)}"}
+
+
+# the same person written differently: case, spaces and accents of the name,
+# case, spaces and gmail dots/+tags of the email
+def variant_of(person, rng):
+    name = person["name"]
+    if rng.random() < 0.5:
+        name = f"  {name.upper()} "
+    else:
+        name = name.replace("é", "e").replace("ã", "a").replace("ç", "c").lower()
+
+    local, _, domain = person["email"].partition("@")
+    if domain == "gmail.com":
+        email = f"{local.replace('.', '')}+news@{domain}"
+    else:
+        email = f" {local.title()}@{domain.upper()}"
+    return {"name": name, "email": email}
+
+
+# the same person with one typo in the name and in the email
+def typo_of(person, rng):
+    def typo(text, start):
+        position = rng.randrange(start, len(text))
+        letter = rng.choice([c for c in "aeiou" if c != text[position]])
+        return text[:position] + letter + text[position + 1:]
+
+    local, _, domain = person["email"].partition("@")
+    return {"name": typo(person["name"], 4), "email": f"{typo(local, 4)}@{domain}"}
+
+
+# partners in odoo and incoming rows for the matching benchmark: rows // 2
+# partners and rows incoming ones, labeled with their kind
+def matching_dataset(rows, seed=42):
+    rng = random.Random(seed)
+    partners = [random_person(rng) for _ in range(rows // 2)]
+    for partner_id, partner in enumerate(partners, start=1):
+        partner["id"] = partner_id
+
+    incoming = []
+    for _ in range(rows):
+        draw = rng.random()
+        if draw < MATCHING_KINDS["same"]:
+            incoming.append(("same", dict(rng.choice(partners))))
+        elif draw < MATCHING_KINDS["same"] + MATCHING_KINDS["variant"]:
+            incoming.append(("variant", variant_of(rng.choice(partners), rng)))
+        elif draw < sum(MATCHING_KINDS.values()):
+            incoming.append(("typo", typo_of(rng.choice(partners), rng)))
+        else:
+            incoming.append(("new", random_person(rng)))
+    return partners, incoming
+
+
+# time the index build and the lookups of one match mode (no server needed)
+def run_matching(mode, partners, incoming):
+    started = time.perf_counter()
+    index = build_contact_index(partners, mode)
+    built = time.perf_counter()
+
+    matched = dict.fromkeys(["same", "variant", "typo", "new"], 0)
+    for kind, contact in incoming:
+        if find_in_contact_index(index, contact):
+            matched[kind] += 1
+    finished = time.perf_counter()
+
+    kinds = {kind: 0 for kind in matched}
+    for kind, _ in incoming:
+        kinds[kind] += 1
+    return {
+        "mode": mode,
+        "rows": len(incoming),
+        "build_seconds": round(built - started, 3),
+        "lookup_seconds": round(finished - built, 3),
+        "rows_per_sec": round(len(incoming) / (finished - built), 1),
+        # share of each kind of incoming row matched to a partner
+        **{
+            f"{kind}_matched": round(matched[kind] / (kinds[kind] or 1), 4)
+            for kind in kinds
+        },
+    }
+
+
+# client-side rpc latency from the metrics json of the importer: the mean of
+# every call and the worst p99 among the calls (upper bound of its histogram
+# bucket). The server-side percentiles miss the network and the client.
+def client_latency(metrics_file):
+    try:
+        with open(metrics_file, encoding="utf-8") as file:
+            rpc = json.load(file)["rpc"]
+    except (OSError, ValueError, KeyError):
+        return {"mean_ms": None, "p99_ms": None}
+
+    latencies = [call["latency"] for call in rpc.values() if "latency" in call]
+    count = sum(latency["count"] for latency in latencies)
+    total = sum(latency["sum_seconds"] for latency in latencies)
+    p99 = [
+        latency["p99_seconds"]
+        for latency in latencies
+        if isinstance(latency["p99_seconds"], float)
+    ]
+    return {
+        "mean_ms": round(total / count * 1000, 3) if count else None,
+        "p99_ms": round(max(p99) * 1000, 3) if p99 else None,
+    }
+
+
+# run one strategy against a fresh mock server and collect its numbers
+def run_strategy(strategy, file_name, rows, server_options):
+    server = start_mock_server(**server_options)
+    env = dict(
+        os.environ,
+        ODOO_URL=server.url,
+        ODOO_DB="benchmark",
+        ODOO_USERNAME="admin",
+        ODOO_PASSWORD="admin",
+        IMPORT_STRATEGY=strategy,
+        # gzip requests only when the mock server inflates them
+        RPC_GZIP="1" if server_options.get("compression") else "0",
+    )
+    # rpc latencies measured by the importer itself (client side)
+    metrics_file = f"{file_name}.{strategy}.metrics.json"
+    env["METRICS_JSON"] = metrics_file
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app2.py")
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script, file_name],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # wait4 gives the resource usage of this child only
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    server.server_close()
+    stats = server.stats()
+    client = client_latency(metrics_file)
+
+    return {
+        "strategy": strategy,
+        "rows": rows,
+        "exit_code": os.waitstatus_to_exitcode(status),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        "rpc_count": stats["rpc_count"],
+        "client_mean_ms": client["mean_ms"],
+        "client_p99_ms": client["p99_ms"],
+        "server_p50_ms": stats["p50_ms"],
+        "server_p99_ms": stats["p99_ms"],
+        "bytes_sent": stats["bytes_received"],
+        "bytes_received": stats["bytes_sent"],
+        # ru_maxrss is in kilobytes on linux
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "partners_created": len(server.database.tables["res.partner"]),
+    }
+
+
+# print the results as an aligned table
+def print_results(results, columns=None):
+    columns = columns or [
+        "strategy", "rows", "seconds", "rows_per_sec", "rpc_count",
+        "client_mean_ms", "client_p99_ms", "server_p50_ms", "peak_rss_mb",
+        "partners_created", "exit_code",
+    ]
+    print(" ".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result[column]):>16}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das estratégias de importação")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos por RPC")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="pedidos e respostas XML-RPC comprimidos com gzip",
+    )
+    parser.add_argument("--workdir", default=None, help="onde gerar os CSVs")
+    parser.add_argument("--output", default=None, help="salva os resultados em JSON")
+    parser.add_argument(
+        "--matching",
+        action="store_true",
+        help="compara os modos de detecção de duplicados (exact, normalized, fuzzy)",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    if args.matching:
+        results = []
+        for rows in sizes:
+            partners, incoming = matching_dataset(rows)
+            for mode in MATCH_MODES:
+                result = run_matching(mode, partners, incoming)
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+
+        print_results(results, list(results[0]))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+        return
+
+    strategies = args.strategies.split(",")
+    server_options = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "failure_rate": args.failure_rate,
+        "fault_rate": args.fault_rate,
+        "compression": args.gzip,
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for rows in sizes:
+            file_name = os.path.join(workdir, f"contatos_{rows}.csv")
+            generate_csv(file_name, rows)
+
+            for strategy in strategies:
+                result = run_strategy(strategy, file_name, rows, server_options)
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import json
+import os
+from input_stream import STDIN
+
+
+# journal written next to the input file
+def checkpoint_path(file_name):
+    return f"{file_name}.checkpoint"
+
+
+# identify the input, so a journal is never resumed against a different file
+def file_identity(file_name):
+    if file_name == STDIN:
+        return {"file": STDIN}
+    stat = os.stat(file_name)
+    return {"file": os.path.abspath(file_name), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+# return the last committed batch of the journal ({"row_index", "offset", ...}), or None
+def read_checkpoint(file_name):
+    try:
+        with open(checkpoint_path(file_name), encoding="utf-8") as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+    except (OSError, ValueError):
+        return None
+
+    if not entries or entries[0].get("identity") != file_identity(file_name):
+        return None
+
+    batches = [entry for entry in entries[1:] if "offset" in entry]
+    return batches[-1] if batches else None
+
+
+# open the journal: a resumed import appends to it, a new one starts it over
+def open_checkpoint(file_name, resume=False):
+    if resume and read_checkpoint(file_name):
+        return open(checkpoint_path(file_name), "a", encoding="utf-8")
+
+    journal = open(checkpoint_path(file_name), "w", encoding="utf-8")
+    journal.write(json.dumps({"identity": file_identity(file_name)}) + "\n")
+    return journal
+
+
+# record a committed batch: position after its last row and the odoo ids created
+def write_checkpoint(journal, row_index, offset, ids):
+    journal.write(
+        json.dumps({"row_index": row_index, "offset": offset, "ids": ids}) + "\n"
+    )
+    journal.flush()
+    os.fsync(journal.fileno())
@@ -0,0 +1,75 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# res.partner values of the company of a contact (is_company), with the details
+# that used to be copied into the x_info_empresa of every contact
+def company_values(contact):
+    return {
+        "name": contact.company_name,
+        "is_company": True,
+        "street": contact.company_location,
+        "phone": contact.company_phone,
+        "website": contact.company_url,
+        "x_setor": contact.company_sector,
+        "x_redes_sociais": contact.company_social,
+        "x_info_empresa": contact.x_info_empresa,
+    }
+
+
+# look up the companies of the given names with one search_read (read only) and
+# add the name -> partner id of the ones that exist to company_ids
+def find_companies(models, db, uid, password, names, company_ids):
+    existing = models.execute_kw(
+        db, uid, password, "res.partner", "search_read",
+        [[("is_company", "=", True), ("name", "in", list(names))]],
+        {"fields": ["name"], "order": "id"},
+    )
+    for company in existing:
+        company_ids.setdefault(company["name"], company["id"])
+
+
+# set parent_id on every contact of the batch. The companies not seen yet in this
+# run are looked up with one search_read and the missing ones created with one
+# create, so every company costs one lookup per run; company_ids keeps the
+# name -> partner id of the companies already resolved.
+def link_companies(models, db, uid, password, contacts, company_ids):
+    # first contact of every new company, in the csv order
+    new_companies = {}
+    for contact in contacts:
+        name = contact.company_name
+        if name and name not in company_ids and name not in new_companies:
+            new_companies[name] = contact
+
+    if new_companies:
+        try:
+            find_companies(models, db, uid, password, new_companies, company_ids)
+
+            missing = [name for name in new_companies if name not in company_ids]
+            if missing:
+                created_ids = models.execute_kw(
+                    db, uid, password, "res.partner", "create",
+                    [[company_values(new_companies[name]) for name in missing]],
+                )
+                if not isinstance(created_ids, list):
+                    created_ids = [created_ids]
+                company_ids.update(zip(missing, created_ids))
+                logger.info(f"{len(missing)} empresas criadas no Odoo")
+
+        except Exception as e:
+            # the contacts go without parent_id, keeping the company details
+            logger.error(f"Erro ao criar empresas: {e}")
+
+    for contact in contacts:
+        contact.parent_id = company_ids.get(contact.company_name, False)
+
+
+# company stage of the pipeline: link the contacts of every batch to their company
+def link_company_batches(models, db, uid, password, batches):
+    company_ids = {}
+    for batch in batches:
+        link_companies(
+            models, db, uid, password, [contact for _, contact in batch], company_ids
+        )
+        yield batch
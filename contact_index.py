@@ -0,0 +1,163 @@
+from difflib import SequenceMatcher
+from reference_data import fold_name
+
+# how contacts are compared with the partners (and with each other):
+# exact - the name as written and the lowercased email
+# normalized - case/accent/space-insensitive names and canonical emails
+# fuzzy - normalized, plus similar names or emails inside the same block
+MATCH_MODES = ("exact", "normalized", "fuzzy")
+
+# minimum similarity (0..1) of two names or emails for a fuzzy match
+FUZZY_THRESHOLD = 0.9
+
+# characters of the name used in the blocking keys
+BLOCK_PREFIX = 3
+
+# entries kept per block: a lookup compares with at most two full blocks, so the
+# fuzzy matching stays linear; partners beyond it are only matched exactly
+MAX_BLOCK_SIZE = 50
+
+# providers that ignore the dots and the +tag of the local part
+DOTLESS_DOMAINS = {"gmail.com": "gmail.com", "googlemail.com": "gmail.com"}
+
+
+# normalize the email used as a duplicate key (emails are case-insensitive)
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+# normalize the name used as a duplicate key
+def normalize_name(name):
+    return (name or "").strip()
+
+
+# canonical email: lowercased without the mailto: prefix, and without the dots
+# and +tag of the addresses whose provider ignores them (gmail)
+def canonical_email(email):
+    email = normalize_email(email).removeprefix("mailto:").strip("<>")
+    local, at, domain = email.rpartition("@")
+    if not at:
+        return email
+
+    domain = domain.rstrip(".")
+    if domain in DOTLESS_DOMAINS:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = DOTLESS_DOMAINS[domain]
+    return f"{local}@{domain}"
+
+
+# name without case, accents and repeated spaces: "José  da Silva" == "jose da silva"
+def canonical_name(name):
+    name = name or ""
+    if name.isascii():
+        return " ".join(name.casefold().split())
+    return " ".join(fold_name(name).split())
+
+
+# create an empty duplicate index with one hash lookup by name and one by email;
+# the fuzzy mode also keeps the blocks of candidates for the similarity matching
+def new_contact_index(mode="exact"):
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Modo de comparação desconhecido: {mode}")
+    return {"names": {}, "emails": {}, "mode": mode, "blocks": {}}
+
+
+# the name and email keys of a contact in the index mode
+def contact_keys(index, contact):
+    name = contact.get("name")
+    email = contact.get("email")
+    if index["mode"] == "exact":
+        return normalize_name(name), normalize_email(email)
+    return canonical_name(name), canonical_email(email)
+
+
+# blocking keys: contacts are only compared with the ones that share the email
+# domain and the start of the name, or the start of the first and last names
+def block_keys(name, email):
+    keys = []
+    prefix = name[:BLOCK_PREFIX]
+    if email:
+        keys.append(f"{email.rpartition('@')[2]}|{prefix}")
+    if name:
+        keys.append(f"{prefix}|{name.rpartition(' ')[2][:BLOCK_PREFIX]}")
+    return keys
+
+
+# the digits of a key: "contato10" and "contato11" are never typos of each other
+def key_digits(key):
+    return "".join(c for c in key if c.isdigit())
+
+
+# add a contact to the index, mapping its name and email to the partner id
+def add_to_contact_index(index, contact, partner_id=True):
+    name, email = contact_keys(index, contact)
+
+    if name:
+        index["names"].setdefault(name, partner_id)
+    if email:
+        index["emails"].setdefault(email, partner_id)
+
+    if index["mode"] == "fuzzy":
+        entry = (name, key_digits(name), email, key_digits(email), partner_id)
+        for key in block_keys(name, email):
+            block = index["blocks"].setdefault(key, [])
+            if len(block) < MAX_BLOCK_SIZE:
+                block.append(entry)
+
+
+# build the duplicate index once from the search_read result
+def build_contact_index(existing_contacts, mode="exact"):
+    index = new_contact_index(mode)
+    for existing_contact in existing_contacts:
+        add_to_contact_index(
+            index, existing_contact, existing_contact.get("id", True)
+        )
+    return index
+
+
+# similarity of two keys with the same digits, checked with the cheap upper
+# bounds of SequenceMatcher first
+def is_similar(matcher, key, digits, candidate, candidate_digits):
+    if not key or not candidate or digits != candidate_digits:
+        return False
+
+    matcher.set_seq1(candidate)
+    return (
+        matcher.real_quick_ratio() >= FUZZY_THRESHOLD
+        and matcher.quick_ratio() >= FUZZY_THRESHOLD
+        and matcher.ratio() >= FUZZY_THRESHOLD
+    )
+
+
+# partner id of the first similar name or email in the blocks of the contact
+def find_similar(index, name, email):
+    name_matcher = SequenceMatcher(None, b=name, autojunk=False)
+    email_matcher = SequenceMatcher(None, b=email, autojunk=False)
+    name_digits = key_digits(name)
+    email_digits = key_digits(email)
+
+    for key in block_keys(name, email):
+        for candidate in index["blocks"].get(key, ()):
+            candidate_name, candidate_name_digits, candidate_email = candidate[:3]
+            if is_similar(
+                name_matcher, name, name_digits, candidate_name, candidate_name_digits
+            ) or is_similar(
+                email_matcher, email, email_digits, candidate_email, candidate[3]
+            ):
+                return candidate[4]
+    return False
+
+
+# return the partner id matched by name or email, or False (O(1) per contact;
+# bounded by the block size in the fuzzy mode)
+def find_in_contact_index(index, contact):
+    name, email = contact_keys(index, contact)
+    if name and name in index["names"]:
+        return index["names"][name]
+
+    if email and email in index["emails"]:
+        return index["emails"][email]
+
+    if index["mode"] == "fuzzy":
+        return find_similar(index, name, email)
+    return False
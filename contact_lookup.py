@@ -0,0 +1,115 @@
+import csv
+import io
+import logging
+from contact_index import add_to_contact_index, new_contact_index
+from contact_mapping import CONTACT_COLUMNS
+from get_ids import count_existing_contacts, iter_contacts_by_keys
+from input_stream import STDIN, open_input
+from partner_snapshot import load_contact_index
+
+logger = logging.getLogger(__name__)
+
+# how the partners are fetched for the dedupe index:
+# snapshot - every partner (paged, optionally cached and synced incrementally)
+# targeted - only the partners with the names and emails of the csv (exact
+#   matching only: the domains cannot find the accent and gmail variants)
+# auto - targeted for small csvs against big databases with exact matching,
+#   snapshot otherwise (the normalized default always downloads every partner)
+LOOKUP_MODES = ("auto", "snapshot", "targeted")
+
+# csvs with more rows always use the snapshot
+TARGETED_MAX_ROWS = 5000
+
+# the targeted lookup is chosen when the database has this many partners per row
+TARGETED_MIN_RATIO = 10
+
+# values of each list per search_read of the targeted lookup
+LOOKUP_CHUNK_SIZE = 500
+
+
+# (rows, names, emails) of the csv, with the names as written and in the usual
+# case variants (the "in" domain is case-sensitive) and the lowercased emails
+# (looked up in any case). None when the csv has more than max_rows rows.
+def scan_contact_keys(file_name, max_rows=TARGETED_MAX_ROWS):
+    rows = 0
+    names = set()
+    emails = set()
+    with io.TextIOWrapper(open_input(file_name), encoding="utf-8", newline="") as file:
+        for rows, row in enumerate(csv.DictReader(file), start=1):
+            if rows > max_rows:
+                return None
+
+            name = (row.get(CONTACT_COLUMNS[0]) or "").strip()
+            email = (row.get(CONTACT_COLUMNS[1]) or "").strip()
+            if name:
+                names.update((name, name.lower(), name.title(), name.upper()))
+            if email:
+                emails.add(email.lower())
+    return rows, names, emails
+
+
+# dedupe index with only the partners that share a name or email with the csv
+def lookup_contact_index(
+    models, db, uid, password, names, emails, match_mode="exact",
+    chunk_size=LOOKUP_CHUNK_SIZE,
+):
+    index = new_contact_index(match_mode)
+    for partner in iter_contacts_by_keys(
+        models, db, uid, password, sorted(names), sorted(emails), chunk_size
+    ):
+        add_to_contact_index(index, partner, partner["id"])
+    return index
+
+
+# build the dedupe index with the lookup mode. In auto mode the csv is scanned
+# first: with at most TARGETED_MAX_ROWS rows and TARGETED_MIN_RATIO partners per
+# row in odoo (one search_count), only the matching partners are fetched.
+# The normalized and fuzzy matching need every partner (a partner stored as
+# "Jose.Da.Silva@Gmail.com" is not found by "josedasilva@gmail.com") and the
+# standard input can only be read once, so they always use the snapshot.
+def load_dedupe_index(
+    models,
+    db,
+    uid,
+    password,
+    url,
+    file_name,
+    snapshot_file=None,
+    page_size=5000,
+    cache=None,
+    match_mode="exact",
+    lookup="auto",
+):
+    if lookup not in LOOKUP_MODES:
+        raise ValueError(f"Modo de busca de duplicados desconhecido: {lookup}")
+
+    if lookup == "targeted" and match_mode != "exact":
+        logger.warning(
+            f"A busca targeted só compara no modo exact; usando o snapshot "
+            f"para o modo {match_mode}"
+        )
+    elif lookup == "auto" and match_mode != "exact":
+        logger.info(
+            f"Baixando todos os contatos existentes (modo {match_mode}); a busca "
+            f"só dos contatos do CSV exige MATCH_MODE=exact"
+        )
+
+    keys = None
+    if lookup != "snapshot" and match_mode == "exact" and file_name != STDIN:
+        keys = scan_contact_keys(
+            file_name, float("inf") if lookup == "targeted" else TARGETED_MAX_ROWS
+        )
+
+    if keys and lookup == "auto":
+        partners = count_existing_contacts(models, db, uid, password)
+        if partners < keys[0] * TARGETED_MIN_RATIO:
+            keys = None
+
+    if not keys:
+        return load_contact_index(
+            models, db, uid, password, url, snapshot_file, page_size, cache,
+            match_mode,
+        )
+
+    logger.info("Buscando apenas os contatos do CSV no Odoo")
+    return lookup_contact_index(models, db, uid, password, *keys[1:], match_mode)
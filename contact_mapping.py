@@ -0,0 +1,172 @@
+from sys import intern
+
+# csv columns read for every contact, in the order contact_from_values takes them
+CONTACT_COLUMNS = [
+    "Nome completo",
+    "E-mail",
+    "Cargo",
+    "Nome da empresa",
+    "Cidade",
+    "País",
+    "Estado",
+    "Localização",
+    "LinkedIn",
+    "Usuário - redes sociais",
+    "Setor",
+    "Localização da empresa",
+    "Telefone da sede",
+    "Setor da empresa",
+    "Tamanho da empresa",
+    "URL da empresa",
+    "Empresa - redes sociais",
+]
+
+
+# compact parsed contact: one slot per value instead of a dict per row, with the
+# repeated values (country, state, sector, company...) interned so every row
+# shares the same string. Supports contact["name"], contact.get("email") and
+# contact["state_id"] = ... like the dicts it replaces; the res.partner dict is
+# only built by to_dict() when the contact is sent to odoo.
+class ContactRecord:
+    __slots__ = (
+        "name",
+        "email",
+        "function",
+        "company_name",
+        "city",
+        "country_id",
+        "state_id",
+        "street",
+        "website",
+        "x_redes_sociais",
+        "x_setor",
+        "company_location",
+        "company_phone",
+        "company_sector",
+        "company_size",
+        "company_url",
+        "company_social",
+        # odoo partner matched by the dedupe step (upsert mode), False for new ones
+        "partner_id",
+        # company partner linked by the company stage, False when not linked
+        "parent_id",
+    )
+
+    # res.partner fields, in the order of the old contact dict
+    PARTNER_FIELDS = __slots__[:11] + ("x_info_empresa",)
+
+    # the company values shown in x_info_empresa
+    COMPANY_SLOTS = ("company_name",) + __slots__[11:17]
+
+    def __init__(self, *values):
+        self.partner_id = False
+        self.parent_id = False
+        for slot, value in zip(self.__slots__, values):
+            setattr(self, slot, value)
+
+    # every slot value, in the order the constructor takes them (plan files)
+    def to_list(self):
+        return [getattr(self, slot) for slot in self.__slots__]
+
+    # pickle as a plain tuple (chunks sent back by the parse workers)
+    def __reduce__(self):
+        return (self.__class__, tuple(self.to_list()))
+
+    def __getitem__(self, key):
+        if key not in self.PARTNER_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.PARTNER_FIELDS or key == "x_info_empresa":
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # custom text field for the company info, one "label: value" per line; empty
+    # without any company value, so the upsert never writes a blank block
+    @property
+    def x_info_empresa(self):
+        if not any(getattr(self, slot) for slot in self.COMPANY_SLOTS):
+            return ""
+        return (
+            f"Nome: {self.company_name}\n"
+            f"Localização: {self.company_location}\n"
+            f"Telefone da sede: {self.company_phone}\n"
+            f"Setor: {self.company_sector}\n"
+            f"Tamanho: {self.company_size}\n"
+            f"URL: {self.company_url}\n"
+            f"Redes Sociais: {self.company_social}"
+        )
+
+    # the res.partner values sent to odoo. A contact linked to its company gets
+    # parent_id instead of a copy of the company details in x_info_empresa.
+    def to_dict(self):
+        if not self.parent_id:
+            return {field: getattr(self, field) for field in self.PARTNER_FIELDS}
+
+        values = {field: getattr(self, field) for field in self.PARTNER_FIELDS[:-1]}
+        values["parent_id"] = self.parent_id
+        return values
+
+
+# build the contact from the stripped CONTACT_COLUMNS values
+def contact_from_values(values):
+    (
+        name, email, function, company_name, city, country, state, street,
+        linkedin, social, sector, company_location, company_phone, company_sector,
+        company_size, company_url, company_social,
+    ) = values
+
+    return ContactRecord(
+        name,
+        email,
+        intern(function),
+        intern(company_name),
+        intern(city),
+        intern(country),
+        intern(state),
+        street,
+        linkedin,
+        social,
+        intern(sector),
+        intern(company_location),
+        intern(company_phone),
+        intern(company_sector),
+        intern(company_size),
+        intern(company_url),
+        intern(company_social),
+    )
+
+
+# map a csv row (dict) to a contact
+def row_to_contact(row):
+    return contact_from_values(
+        [(row.get(column) or "").strip() for column in CONTACT_COLUMNS]
+    )
+
+
+# return a function that maps a csv row given as a list of values, with the
+# column positions looked up once from the header instead of once per row
+def make_row_mapper(fieldnames):
+    # the last column wins when a name repeats, as in dict(zip(fieldnames, values))
+    column_positions = {name: position for position, name in enumerate(fieldnames)}
+    positions = [column_positions.get(column) for column in CONTACT_COLUMNS]
+
+    def map_row(values):
+        size = len(values)
+        return contact_from_values(
+            [
+                values[position].strip()
+                if position is not None and position < size
+                else ""
+                for position in positions
+            ]
+        )
+
+    return map_row
@@ -0,0 +1,167 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import dotenv_values
+from contact_lookup import load_dedupe_index
+from contact_mapping import ContactRecord, row_to_contact
+from companies import link_company_batches
+from input_stream import is_plain_file
+from instrumentation import MeteredServerProxy, metrics
+from parallel_csv import read_contacts_parallel
+from pipeline import (
+    batched,
+    create_batches,
+    dedupe_contacts,
+    filter_contacts,
+    read_csv_rows,
+    resolve_references,
+)
+from reference_data import load_reference_data
+from resilient_rpc import ResilientModels
+
+logger = logging.getLogger(__name__)
+
+# connection settings of a target, as in the main environment
+TARGET_SETTINGS = {
+    "url": "ODOO_URL",
+    "db": "ODOO_DB",
+    "username": "ODOO_USERNAME",
+    "password": "ODOO_PASSWORD",
+}
+
+
+# the target databases of a fan-out import, one env file each with its own
+# ODOO_URL, ODOO_DB, ODOO_USERNAME and ODOO_PASSWORD; the values missing from a
+# file come from the main environment. A target is named after its file.
+def read_targets(env_files):
+    targets = []
+    for env_file in env_files:
+        if not os.path.isfile(env_file):
+            raise FileNotFoundError(f"Destino '{env_file}' não encontrado")
+
+        values = dotenv_values(env_file)
+        target = {
+            "name": os.path.splitext(os.path.basename(env_file))[0],
+            **{
+                key: values.get(variable) or os.getenv(variable)
+                for key, variable in TARGET_SETTINGS.items()
+            },
+        }
+        if not target["url"] or not target["db"]:
+            raise ValueError(f"Destino '{env_file}' sem ODOO_URL ou ODOO_DB")
+        targets.append(target)
+
+    names = [target["name"] for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError("Os arquivos de destino precisam ter nomes diferentes")
+    return targets
+
+
+# per-target version of a file shared by the targets (partner snapshot, row
+# report): "contatos.csv" -> "contatos.<target>.csv"; None stays None
+def target_file_name(file_name, target):
+    if not file_name:
+        return None
+    root, extension = os.path.splitext(file_name)
+    return f"{root}.{target['name']}{extension}"
+
+
+# parse, normalize and validate the csv once for every target: returns the valid
+# contacts, in the file order and without the duplicates inside the csv, and the
+# (status, row_index, contact) of the rejected rows, reported again by each target
+def parse_contacts(
+    file_name, match_mode="exact", parse_workers=1, parse_chunk_size=4 << 20
+):
+    rejected = []
+
+    def reject(status, row_index, contact, detail=None):
+        rejected.append((status, row_index, contact))
+
+    if parse_workers > 1 and is_plain_file(file_name):
+        contacts = read_contacts_parallel(file_name, parse_workers, parse_chunk_size)
+    else:
+        contacts = (
+            (row_index, row_to_contact(row))
+            for row_index, row in read_csv_rows(file_name)
+        )
+    with metrics.timed("parse_contacts"):
+        contacts = list(filter_contacts(contacts, reject, match_mode))
+    return contacts, rejected
+
+
+# a copy of every contact for one target: dedupe, resolve and link write the
+# partner, country, state and company ids of their own database on the contacts
+def copy_contacts(contacts):
+    for row_index, contact in contacts:
+        yield row_index, ContactRecord(*contact.to_list())
+
+
+# import the parsed contacts into one target with its own connection, reference
+# tables, dedupe index and rate control: dedupe -> resolve -> batch -> link
+# companies (optional) -> batch-create, as in run_import but without the
+# checkpoint journal, which belongs to the file and not to a database.
+# Returns the number of contacts sent.
+def import_parsed(
+    url,
+    db,
+    uid,
+    password,
+    file_name,
+    contacts,
+    rejected,
+    batch_size,
+    report,
+    snapshot_file=None,
+    page_size=5000,
+    limiter=None,
+    breaker=None,
+    upsert=False,
+    companies=False,
+    cache=None,
+    match_mode="exact",
+    lookup="auto",
+):
+    models = ResilientModels(
+        MeteredServerProxy(f"{url}/xmlrpc/2/object"), limiter, breaker
+    )
+    for status, row_index, contact in rejected:
+        report(status, row_index, contact)
+
+    with metrics.timed("get_existing_contacts"):
+        contact_index = load_dedupe_index(
+            models, db, uid, password, url, file_name, snapshot_file, page_size,
+            cache, match_mode, lookup,
+        )
+    reference_data = load_reference_data(models, db, uid, password, cache)
+
+    contacts = dedupe_contacts(copy_contacts(contacts), contact_index, report, upsert)
+    contacts = resolve_references(contacts, reference_data)
+    batches = batched(contacts, limiter.current_batch_size if limiter else batch_size)
+    if companies:
+        batches = link_company_batches(models, db, uid, password, batches)
+
+    total = 0
+    for sent, _ in create_batches(models, db, uid, password, batches, report):
+        total += sent
+    return total
+
+
+# run import_target(target) for every target at the same time, one thread each,
+# so the whole import takes about as long as the slowest target. A failed target
+# does not stop the others. Returns {target name: total sent, or the exception}.
+def fan_out(targets, import_target):
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=len(targets), thread_name_prefix="target"
+    ) as executor:
+        futures = {
+            target["name"]: executor.submit(import_target, target)
+            for target in targets
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"[{name}] Erro ao importar contatos: {e}")
+                results[name] = e
+    return results
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+from array import array
+from hashlib import blake2b
+from contact_index import canonical_email
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# bump when the fingerprint of a row changes: older stores are ignored
+FINGERPRINT_VERSION = 1
+
+# results that leave the partner in odoo matching the row. Failed rows are never
+# recorded, so they are sent again on the next run.
+RECORDED_STATUSES = {"created", "updated", "unchanged", "duplicate"}
+
+# csv values of a contact (the slots before partner_id and parent_id)
+MAPPED_FIELDS = 17
+
+
+# 64-bit hash of a text, as an int
+def hash64(text):
+    return int.from_bytes(blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# rows of the previous imports, as {hash of the canonical email: hash of the
+# mapped csv values}, in a compact binary file: a json header line (target,
+# mode) followed by the pairs as unsigned 64-bit ints.
+# skip_unchanged drops the rows whose values did not change since they were last
+# imported, right after parsing and validation; recording(report) wraps the
+# reporter so every row that reached odoo updates its fingerprint. The store is
+# only reused for the same url, database, upsert and companies modes.
+class FingerprintStore:
+    def __init__(self, file_name, url, db, upsert=False, companies=False):
+        self.file_name = file_name
+        self.header = {
+            "version": FINGERPRINT_VERSION,
+            "url": url,
+            "db": db,
+            "upsert": upsert,
+            "companies": companies,
+        }
+        self.entries = {}
+        # fingerprints of the rows on their way to odoo, by row_index
+        self.pending = {}
+        self.skipped = 0
+        self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.save()
+
+    def load(self):
+        try:
+            with open(self.file_name, "rb") as file:
+                header = json.loads(file.readline())
+                pairs = array("Q")
+                pairs.frombytes(file.read())
+        except (OSError, ValueError):
+            return
+
+        if header != self.header:
+            logger.info("Impressões digitais de outra importação, ignoradas")
+            return
+        self.entries = dict(zip(pairs[0::2], pairs[1::2]))
+
+    # write the store atomically, so a crash never leaves a half-written file
+    def save(self):
+        pairs = array("Q")
+        for key, value in self.entries.items():
+            pairs.append(key)
+            pairs.append(value)
+
+        temp_file = f"{self.file_name}.tmp"
+        with open(temp_file, "wb") as file:
+            file.write(json.dumps(self.header).encode("utf-8") + b"\n")
+            pairs.tofile(file)
+        os.replace(temp_file, self.file_name)
+
+    # (key, fingerprint) of a parsed contact, or None without an email
+    @staticmethod
+    def fingerprint(contact):
+        email = canonical_email(contact.email)
+        if not email:
+            return None
+        values = contact.to_list()[:MAPPED_FIELDS]
+        return hash64(email), hash64("\x1f".join(values))
+
+    # drop the rows imported before with the same values
+    def skip_unchanged(self, contacts):
+        for row_index, contact in contacts:
+            fingerprint = self.fingerprint(contact)
+            if fingerprint and self.entries.get(fingerprint[0]) == fingerprint[1]:
+                self.skipped += 1
+                metrics.count_rows("skipped")
+                continue
+
+            if fingerprint:
+                self.pending[row_index] = fingerprint
+            yield row_index, contact
+
+    # reporter that records the fingerprint of the rows that reached odoo
+    def recording(self, report):
+        def record(status, row_index, contact, detail=None):
+            fingerprint = self.pending.pop(row_index, None)
+            if fingerprint and status in RECORDED_STATUSES:
+                self.entries[fingerprint[0]] = fingerprint[1]
+            report(status, row_index, contact, detail)
+
+        return record
@@ -1,22 +1,38 @@
-# get the country id based on the country name
-def get_country_id(models, db, uid, password, country_name):
-    country_ids = models.execute_kw(db, uid, password, "res.country", "search", [[('name', '=', country_name)]])
-    return country_ids[0] if country_ids else False
+# get the partners page by page (keyset pagination on the id), so no single response is huge
+def iter_existing_contacts(models, db, uid, password, domain=None, fields=None, page_size=5000):
+    if domain is None:
+        domain = [('name', '!=', False), ('email', '!=', False)]
+    last_id = 0
 
-# get the state id based on the state name
-def get_state_id(models, db, uid, password, country_id, state_name):
-    state_ids = models.execute_kw(db, uid, password, "res.country.state", "search", [[("name", "=", state_name), ("country_id", "=", country_id)]])
-    return state_ids[0] if state_ids else False 
+    while True:
+        page = models.execute_kw(db, uid, password, 'res.partner', 'search_read',
+            [[('id', '>', last_id)] + domain],
+            {'fields': fields or ['name', 'email'], 'order': 'id', 'limit': page_size}
+        )
+        yield from page
+
+        if len(page) < page_size:
+            break
+        last_id = page[-1]['id']
+
+# get only the partners whose name is in the given list or whose email matches one
+# of the given emails in any case (=ilike), chunk_size values of each per search_read
+def iter_contacts_by_keys(models, db, uid, password, names, emails, chunk_size=500):
+    names = list(names)
+    emails = list(emails)
 
-# get all the contacts  
-def get_existing_contacts(models, db, uid, password):
-    try:
-        existing_contacts = models.execute_kw(db, uid, password, 'res.partner', 'search_read', 
-            [[('name', '!=', False), ('email', '!=', False)]], 
+    for start in range(0, max(len(names), len(emails)), chunk_size):
+        keys = [('name', 'in', names[start:start + chunk_size])] + [
+            ('email', '=ilike', email) for email in emails[start:start + chunk_size]
+        ]
+        yield from models.execute_kw(db, uid, password, 'res.partner', 'search_read',
+            [[('name', '!=', False), ('email', '!=', False)]
+             + ['|'] * (len(keys) - 1) + keys],
             {'fields': ['name', 'email']}
         )
-        return existing_contacts
 
-    except Exception as e:
-        print(f"Erro ao buscar contatos existentes: {e}")
-        return []
\ No newline at end of file
+# count the partners that iter_existing_contacts would download
+def count_existing_contacts(models, db, uid, password):
+    return models.execute_kw(db, uid, password, 'res.partner', 'search_count',
+        [[('name', '!=', False), ('email', '!=', False)]]
+    )
@@ -0,0 +1,281 @@
+import asyncio
+import time
+from async_client import AsyncOdooClient, gather_bounded, iterate_in_thread
+from batch_create import (
+    UPSERT_FIELDS,
+    changed_fields,
+    create_partners_batch,
+    update_partners_batch,
+)
+from companies import link_company_batches
+from instrumentation import MeteredServerProxy, metrics
+from pipeline import batched, log_result, prepare_contacts, run_import
+from resilient_rpc import ResilientModels, execute_async_with_retries
+from uploader import upload_concurrently
+
+# how the contacts are sent to odoo; every strategy runs the same parse, dedupe
+# and resolve stages (pipeline.prepare_contacts) and reports the same statuses
+STRATEGIES = ("serial", "threads", "async", "batch-create")
+
+
+# send one contact: create it, or update the changed fields of the matched partner
+# (upsert mode). Returns (status, detail) as passed to the reporters.
+def send_contact(models, db, uid, password, contact):
+    if contact.partner_id:
+        [(_, changes, error)] = update_partners_batch(
+            models, db, uid, password, [contact]
+        )
+        if error:
+            return "failed", error
+        return ("updated", sorted(changes)) if changes else ("unchanged", None)
+
+    [(_, contact_id, error)] = create_partners_batch(
+        models, db, uid, password, [contact]
+    )
+    return ("failed", error) if error else ("created", contact_id)
+
+
+# one rpc per contact, in the file order
+def run_serial(models, url, db, uid, password, contacts, on_result, **options):
+    for row_index, contact in contacts:
+        on_result(row_index, contact, *send_contact(models, db, uid, password, contact))
+
+
+# one rpc per contact on a thread pool, each worker with its own connection; with
+# a limiter, max_workers is only the ceiling of the adaptive concurrency. At most
+# queue_size contacts (default max_workers * 2) are read ahead of the results.
+def run_threads(
+    models,
+    url,
+    db,
+    uid,
+    password,
+    contacts,
+    on_result,
+    limiter=None,
+    breaker=None,
+    max_workers=10,
+    queue_size=None,
+):
+    # the task every worker runs with its own connection (retried on transient errors)
+    def task(worker_models, item):
+        return send_contact(
+            ResilientModels(worker_models, limiter, breaker),
+            db,
+            uid,
+            password,
+            item[1],
+        )
+
+    # the results are reported here, by a single thread, as the futures finish
+    for (row_index, contact), result, error in upload_concurrently(
+        url, task, contacts, max_workers, queue_size or max_workers * 2, limiter
+    ):
+        if error:
+            on_result(row_index, contact, "failed", error)
+        else:
+            on_result(row_index, contact, *result)
+
+
+# execute_kw on the async client, retried like ResilientModels does and every
+# attempt recorded in the metrics like the sync calls (without the byte counts)
+async def execute_async(client, model, method, args, kwargs=None, breaker=None):
+    async def attempt():
+        started = time.monotonic()
+        error = False
+        try:
+            return await client.execute_kw(model, method, args, kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.record_rpc(
+                f"{model}.{method}", time.monotonic() - started, 0, 0, error
+            )
+
+    return await execute_async_with_retries(attempt, method, breaker)
+
+
+# async version of send_contact
+async def send_contact_async(client, contact, breaker=None):
+    if contact.partner_id:
+        stored = await execute_async(
+            client, "res.partner", "read", [[contact.partner_id]],
+            {"fields": UPSERT_FIELDS}, breaker,
+        )
+        if not stored:
+            raise LookupError(f"Parceiro {contact.partner_id} não encontrado")
+
+        changes = changed_fields(contact.to_dict(), stored[0])
+        if not changes:
+            return "unchanged", None
+        await execute_async(
+            client, "res.partner", "write", [[contact.partner_id], changes], None,
+            breaker,
+        )
+        return "updated", sorted(changes)
+
+    contact_id = await execute_async(
+        client, "res.partner", "create", [contact.to_dict()], None, breaker
+    )
+    return "created", contact_id
+
+
+# one rpc per contact from a single event loop, with up to max_workers calls in
+# flight over the keep-alive connections of the async client (json-rpc). The
+# contacts are produced (csv, dedupe, company rpcs) on a worker thread, so the
+# loop never blocks on them, at most queue_size (default max_workers * 2) ahead.
+def run_async(
+    models,
+    url,
+    db,
+    uid,
+    password,
+    contacts,
+    on_result,
+    breaker=None,
+    max_workers=10,
+    queue_size=None,
+    **options,
+):
+    async def send_all():
+        async with AsyncOdooClient(url, db, max_in_flight=max_workers) as client:
+            client.uid = uid
+            client.password = password
+
+            async def send(item):
+                return await send_contact_async(client, item[1], breaker)
+
+            items = iterate_in_thread(contacts, queue_size or max_workers * 2)
+            async for (row_index, contact), result, error in gather_bounded(
+                send, items, max_workers
+            ):
+                if error:
+                    on_result(row_index, contact, "failed", error)
+                else:
+                    on_result(row_index, contact, *result)
+
+    asyncio.run(send_all())
+
+
+# the strategies that send one contact at a time
+EXECUTORS = {"serial": run_serial, "threads": run_threads, "async": run_async}
+
+
+# import the csv with the chosen strategy. batch-create is the streaming pipeline
+# (run_import: batched creates, grouped writes, checkpoints); the others share its
+# stages and send one contact per rpc. With a FingerprintStore only the new and
+# changed rows are sent. Returns the number of contacts sent.
+def import_file(
+    url,
+    db,
+    uid,
+    password,
+    file_name,
+    strategy="batch-create",
+    batch_size=500,
+    report=log_result,
+    snapshot_file=None,
+    page_size=5000,
+    resume=False,
+    limiter=None,
+    breaker=None,
+    parse_workers=1,
+    parse_chunk_size=4 << 20,
+    upsert=False,
+    companies=False,
+    cache=None,
+    match_mode="exact",
+    lookup="auto",
+    max_workers=10,
+    queue_size=None,
+    fingerprints=None,
+    contact_index=None,
+    reference_data=None,
+):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia desconhecida: {strategy}")
+    if fingerprints:
+        report = fingerprints.recording(report)
+
+    if strategy == "batch-create":
+        return run_import(
+            url,
+            db,
+            uid,
+            password,
+            file_name,
+            batch_size,
+            report,
+            snapshot_file,
+            page_size,
+            resume,
+            limiter,
+            breaker,
+            parse_workers,
+            parse_chunk_size,
+            upsert,
+            companies,
+            cache,
+            match_mode,
+            lookup,
+            fingerprints,
+            contact_index,
+            reference_data,
+        )
+
+    if resume:
+        raise ValueError("A retomada (--resume) só existe na estratégia batch-create")
+
+    models = ResilientModels(
+        MeteredServerProxy(f"{url}/xmlrpc/2/object"), limiter, breaker
+    )
+    contacts, _ = prepare_contacts(
+        models,
+        db,
+        uid,
+        password,
+        url,
+        file_name,
+        report,
+        snapshot_file,
+        page_size,
+        parse_workers,
+        parse_chunk_size,
+        upsert,
+        cache=cache,
+        match_mode=match_mode,
+        lookup=lookup,
+        fingerprints=fingerprints,
+        contact_index=contact_index,
+        reference_data=reference_data,
+    )
+    if companies:
+        # the companies are still created in batches, before their contacts
+        batches = link_company_batches(
+            models, db, uid, password, batched(contacts, batch_size)
+        )
+        contacts = (item for batch in batches for item in batch)
+
+    total = 0
+
+    def on_result(row_index, contact, status, detail=None):
+        nonlocal total
+        total += 1
+        metrics.count_rows(status)
+        report(status, row_index, contact, detail)
+
+    EXECUTORS[strategy](
+        models,
+        url,
+        db,
+        uid,
+        password,
+        contacts,
+        on_result,
+        limiter=limiter,
+        breaker=breaker,
+        max_workers=max_workers,
+        queue_size=queue_size,
+    )
+    return total
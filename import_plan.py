@@ -0,0 +1,372 @@
+import json
+import logging
+import os
+import shutil
+from batch_create import (
+    create_partners_batch,
+    diff_partners_batch,
+    write_partner_updates,
+)
+from checkpoint import file_identity
+from companies import find_companies, link_companies
+from contact_mapping import ContactRecord
+from instrumentation import MeteredServerProxy, metrics
+from pipeline import batched, log_result, prepare_contacts
+from resilient_rpc import ResilientModels
+
+logger = logging.getLogger(__name__)
+
+# estimated server time per partner created or updated, on top of the round trip
+SECONDS_PER_RECORD = 0.005
+
+# how many unresolved names are listed on the console (the plan has all of them)
+MAX_LISTED_NAMES = 20
+
+# parent_id of the contacts whose company is missing in odoo while they are
+# diffed: never a real partner id, so the link always shows up as a change
+NEW_COMPANY = -1
+
+
+# count the rpcs the apply step will send: it reads the plan entries in batches of
+# batch_size, with one create per batch and one write per distinct changes. With
+# the company stage (company_ids, the name -> id of the companies found in odoo)
+# a batch also sends one search_read for the companies not seen in the earlier
+# batches and one create for those of them that are missing.
+class RpcEstimate:
+    def __init__(self, batch_size, company_ids=None):
+        self.batch_size = batch_size
+        self.company_ids = company_ids
+        self.seen_companies = set()
+        self.rpcs = 0
+        self.entries = 0
+        self.has_create = False
+        self.distinct_changes = set()
+        self.new_companies = set()
+
+    def add(self, changes=None, company_name=""):
+        if changes is None:
+            self.has_create = True
+        else:
+            key = dict(changes)
+            # a company created by the apply step: one write per company
+            if "parent_id" in key and key["parent_id"] is None:
+                key["parent_id"] = company_name
+            self.distinct_changes.add(tuple(sorted(key.items())))
+
+        if (
+            self.company_ids is not None
+            and company_name
+            and company_name not in self.seen_companies
+        ):
+            self.seen_companies.add(company_name)
+            self.new_companies.add(company_name)
+
+        self.entries += 1
+        if self.entries == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.rpcs += int(self.has_create) + len(self.distinct_changes)
+        if self.new_companies:
+            self.rpcs += 1
+            if any(name not in self.company_ids for name in self.new_companies):
+                self.rpcs += 1
+        self.entries = 0
+        self.has_create = False
+        self.distinct_changes = set()
+        self.new_companies = set()
+
+
+# read-only company stage of the plan: look up the companies not searched yet and
+# set parent_id on the contacts, NEW_COMPANY for the companies missing in odoo
+# (created by the apply step). company_ids gets the companies found, searched the
+# names already looked up.
+def plan_companies(models, db, uid, password, contacts, company_ids, searched):
+    names = {contact.company_name for contact in contacts if contact.company_name}
+    names -= searched
+    if names:
+        find_companies(models, db, uid, password, sorted(names), company_ids)
+        searched.update(names)
+
+    for contact in contacts:
+        if contact.company_name:
+            contact.parent_id = company_ids.get(contact.company_name, NEW_COMPANY)
+
+
+# the country and state names of the csv that matched no odoo record
+def unresolved_references(reference_data):
+    countries = sorted(
+        name
+        for name, country_id in reference_data["country_lookups"].items()
+        if (name or "").strip() and not country_id
+    )
+
+    country_names = {
+        country_id: name
+        for name, country_id in reference_data["countries"]["names"].items()
+    }
+    # states of an unresolved country are already covered by the country
+    states = sorted(
+        f"{country_names.get(country_id, country_id)}/{name}"
+        for (country_id, name), state_id in reference_data["state_lookups"].items()
+        if country_id and (name or "").strip() and not state_id
+    )
+    return countries, states
+
+
+# run the parse, dedupe and reference stages with read-only rpcs only and save
+# what the import would do: one line per partner to create or update (with the
+# resolved values and the changed fields), after a header line with the summary.
+# Nothing is written to odoo. Returns the summary.
+def build_plan(
+    url,
+    db,
+    uid,
+    password,
+    file_name,
+    plan_file,
+    batch_size,
+    report=None,
+    snapshot_file=None,
+    page_size=5000,
+    parse_workers=1,
+    parse_chunk_size=4 << 20,
+    upsert=False,
+    seconds_per_record=SECONDS_PER_RECORD,
+    cache=None,
+    match_mode="exact",
+    lookup="auto",
+    companies=False,
+):
+    models = ResilientModels(MeteredServerProxy(f"{url}/xmlrpc/2/object"))
+    counts = dict.fromkeys(
+        ["create", "update", "unchanged", "duplicate", "invalid", "failed"], 0
+    )
+
+    # the rows skipped by the stages are only counted (and reported, if asked)
+    def count_skipped(status, row_index, contact, detail=None):
+        counts[status] += 1
+        if report:
+            report(status, row_index, contact, detail)
+
+    contacts, reference_data = prepare_contacts(
+        models,
+        db,
+        uid,
+        password,
+        url,
+        file_name,
+        count_skipped,
+        snapshot_file,
+        page_size,
+        parse_workers,
+        parse_chunk_size,
+        upsert,
+        cache=cache,
+        match_mode=match_mode,
+        lookup=lookup,
+    )
+
+    company_ids = {} if companies else None
+    searched_companies = set()
+    estimate = RpcEstimate(batch_size, company_ids)
+    entries_file = f"{plan_file}.entries"
+    with open(entries_file, "w", encoding="utf-8") as entries:
+
+        def write_entry(action, row_index, contact, changes=None):
+            # the missing companies are created and linked by the apply step
+            if contact.parent_id == NEW_COMPANY:
+                contact.parent_id = False
+                if changes:
+                    changes["parent_id"] = None
+            entry = {
+                "action": action,
+                "row_index": row_index,
+                "contact": contact.to_list(),
+            }
+            if changes is not None:
+                entry["changes"] = changes
+            entries.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        for batch in batched(contacts, batch_size):
+            if companies:
+                plan_companies(
+                    models, db, uid, password, [contact for _, contact in batch],
+                    company_ids, searched_companies,
+                )
+            matched = []
+            for row_index, contact in batch:
+                if contact.partner_id:
+                    matched.append((row_index, contact))
+                    continue
+                write_entry("create", row_index, contact)
+                estimate.add(company_name=contact.company_name)
+                counts["create"] += 1
+
+            # updates are diffed against the stored values now (read only)
+            diffs = diff_partners_batch(
+                models, db, uid, password, [contact for _, contact in matched]
+            )
+            for (row_index, _), (contact, changes, error) in zip(matched, diffs):
+                if error:
+                    counts["failed"] += 1
+                    logger.error(f"Erro ao comparar contato {contact['name']}: {error}")
+                elif changes:
+                    write_entry("update", row_index, contact, changes)
+                    estimate.add(changes, contact.company_name)
+                    counts["update"] += 1
+                else:
+                    counts["unchanged"] += 1
+        estimate.flush()
+
+    countries, states = unresolved_references(reference_data)
+    records = counts["create"] + counts["update"]
+    summary = {
+        "rows": counts,
+        "unresolved_countries": countries,
+        "unresolved_states": states,
+        "estimated_rpcs": estimate.rpcs,
+        # round trip measured on the planning rpcs plus a per-record server cost
+        "estimated_seconds": round(
+            estimate.rpcs * metrics.mean_rpc_latency() + records * seconds_per_record,
+            1,
+        ),
+    }
+    header = {
+        "plan": {
+            "url": url,
+            "db": db,
+            "source": file_identity(file_name),
+            "upsert": upsert,
+            # the apply step links the companies and batches the entries the same way
+            "companies": companies,
+            "batch_size": batch_size,
+            "summary": summary,
+        }
+    }
+
+    # header first, then the entries; replaced atomically so a plan is never partial
+    temp_file = f"{plan_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        file.write(json.dumps(header, ensure_ascii=False) + "\n")
+        with open(entries_file, encoding="utf-8") as entries:
+            shutil.copyfileobj(entries, file)
+    os.replace(temp_file, plan_file)
+    os.remove(entries_file)
+    return summary
+
+
+# show the plan summary on the console
+def log_plan_summary(summary):
+    rows = summary["rows"]
+    logger.info(
+        f"Criar: {rows['create']} | Atualizar: {rows['update']} | "
+        f"Sem alterações: {rows['unchanged']} | Duplicados: {rows['duplicate']} | "
+        f"Inválidos: {rows['invalid']} | Falhas: {rows['failed']}"
+    )
+    for label, names in (
+        ("Países não encontrados", summary["unresolved_countries"]),
+        ("Estados não encontrados", summary["unresolved_states"]),
+    ):
+        if names:
+            listed = ", ".join(names[:MAX_LISTED_NAMES])
+            more = "..." if len(names) > MAX_LISTED_NAMES else ""
+            logger.info(f"{label} ({len(names)}): {listed}{more}")
+    logger.info(
+        f"RPCs estimadas: {summary['estimated_rpcs']}, "
+        f"tempo estimado: {summary['estimated_seconds']:.1f} segundos"
+    )
+
+
+# read the header of a saved plan
+def read_plan_header(plan_file):
+    with open(plan_file, encoding="utf-8") as file:
+        return json.loads(file.readline())["plan"]
+
+
+# send a saved plan to odoo without parsing, deduping or resolving anything again:
+# the entries are read in batches of the planned batch size (the estimate counted
+# those), the companies linked when the plan has the company stage, the planned
+# partners created with one create per batch and the planned changes written with
+# grouped writes. The plan assumes odoo did not change since it was built.
+# Returns the number of planned rows sent.
+def apply_plan(url, db, uid, password, plan_file, report=log_result, breaker=None):
+    header = read_plan_header(plan_file)
+    if header["url"] != url or header["db"] != db:
+        raise ValueError(
+            f"O plano foi gerado para {header['url']} ({header['db']}), "
+            f"não para {url} ({db})"
+        )
+
+    models = ResilientModels(
+        MeteredServerProxy(f"{url}/xmlrpc/2/object"), breaker=breaker
+    )
+    company_ids = {}
+    total = 0
+    with open(plan_file, encoding="utf-8") as file:
+        file.readline()
+        entries = (json.loads(line) for line in file if line.strip())
+
+        for batch in batched(entries, header["batch_size"]):
+            creates = []
+            updates = []
+            for entry in batch:
+                contact = ContactRecord(*entry["contact"])
+                if entry["action"] == "create":
+                    creates.append((entry["row_index"], contact))
+                else:
+                    updates.append((entry["row_index"], contact, entry["changes"]))
+
+            if header["companies"]:
+                link_companies(
+                    models, db, uid, password,
+                    [contact for _, contact in creates]
+                    + [contact for _, contact, _ in updates],
+                    company_ids,
+                )
+                for _, contact, changes in updates:
+                    # the planned link, to a company that may only exist now
+                    if "parent_id" in changes:
+                        if contact.parent_id:
+                            changes["parent_id"] = contact.parent_id
+                        else:
+                            del changes["parent_id"]
+
+            if creates:
+                results = create_partners_batch(
+                    models, db, uid, password, [contact for _, contact in creates]
+                )
+                for (row_index, _), (contact, contact_id, error) in zip(
+                    creates, results
+                ):
+                    if error:
+                        metrics.count_rows("failed")
+                        report("failed", row_index, contact, error)
+                    else:
+                        metrics.count_rows("created")
+                        report("created", row_index, contact, contact_id)
+
+            # an update left without changes only linked a company that failed
+            for row_index, contact, changes in updates:
+                if not changes:
+                    metrics.count_rows("unchanged")
+                    report("unchanged", row_index, contact)
+            updates = [update for update in updates if update[2]]
+
+            if updates:
+                results = write_partner_updates(
+                    models, db, uid, password,
+                    [(contact, changes) for _, contact, changes in updates],
+                )
+                for (row_index, _, _), (contact, changes, error) in zip(
+                    updates, results
+                ):
+                    if error:
+                        metrics.count_rows("failed")
+                        report("failed", row_index, contact, error)
+                    else:
+                        metrics.count_rows("updated")
+                        report("updated", row_index, contact, sorted(changes))
+
+            total += len(batch)
+    return total
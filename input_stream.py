@@ -0,0 +1,105 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# file name that reads the csv from the standard input
+STDIN = "-"
+
+# extensions of the csv files picked up by the daemon mode
+CSV_EXTENSIONS = (".csv", ".csv.gz", ".csv.bz2", ".csv.xz", ".csv.zst")
+
+# compressed formats, recognized by their first bytes (not by the extension)
+MAGIC_NUMBERS = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+
+# bytes read at a time when skipping forward in a stream that cannot seek
+SKIP_BLOCK_SIZE = 1 << 20
+
+
+# the input exists: a file on disk, or the standard input
+def input_exists(file_name):
+    return file_name == STDIN or os.path.isfile(file_name)
+
+
+# compression of a buffered binary stream ("gzip", "bz2", "xz", "zstd"), or None
+def detect_compression(file):
+    head = file.peek(6)[:6]
+    for magic, compression in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+# a plain csv on disk: can be split by byte offsets (parallel parsing)
+def is_plain_file(file_name):
+    if file_name == STDIN:
+        return False
+    with open(file_name, mode="rb") as file:
+        return detect_compression(file) is None
+
+
+# decompressed stream of a file, closing the file together with it
+class DecompressedInput(io.BufferedReader):
+    def __init__(self, stream, file):
+        super().__init__(stream, SKIP_BLOCK_SIZE)
+        self.file = file
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.file.close()
+
+
+# open the input as a binary stream of the csv bytes: "-" reads the standard
+# input, and gzip, bz2, xz and zstd (with the zstandard package) files or pipes
+# are decompressed on the fly, so they never need to be unpacked on disk
+def open_input(file_name):
+    if file_name == STDIN:
+        # a copy of the descriptor, so closing the input leaves sys.stdin open
+        file = os.fdopen(os.dup(sys.stdin.buffer.fileno()), "rb")
+    else:
+        file = open(file_name, mode="rb")
+
+    compression = detect_compression(file)
+    if compression == "gzip":
+        return DecompressedInput(gzip.GzipFile(fileobj=file), file)
+    if compression == "bz2":
+        return DecompressedInput(bz2.BZ2File(file), file)
+    if compression == "xz":
+        return DecompressedInput(lzma.LZMAFile(file), file)
+    if compression == "zstd":
+        if zstandard is None:
+            file.close()
+            raise ValueError(
+                f"'{file_name}' está comprimido com zstd: instale o pacote zstandard"
+            )
+        reader = zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+        return DecompressedInput(reader, file)
+    return file
+
+
+# move the stream from position to offset: seek when it can, otherwise (pipes,
+# zstd) read and drop the bytes in between
+def skip_to(file, position, offset):
+    if file.seekable():
+        file.seek(offset)
+        return
+
+    while position < offset:
+        block = file.read(min(SKIP_BLOCK_SIZE, offset - position))
+        if not block:
+            break
+        position += len(block)
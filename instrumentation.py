@@ -0,0 +1,367 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import xmlrpc.client
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (seconds) of the latency histogram buckets, as in prometheus
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# prefix of every metric in the prometheus text file
+PROMETHEUS_PREFIX = "odoo_import"
+
+
+# fixed-bucket latency histogram; the last bucket is +Inf
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    # upper bound of the bucket holding the q-th observation (None if empty,
+    # "+Inf" past the last bucket)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return "+Inf"
+
+
+# counters, histograms and row rates of one import run. Every update takes the
+# lock, so the workers of app1.py can share the same instance.
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        # (metric, label) -> value
+        self.counters = {}
+        # (metric, label) -> Histogram
+        self.histograms = {}
+        # stage -> [first row time, last row time]
+        self.stage_times = {}
+
+    def count(self, metric, label, value=1):
+        with self.lock:
+            key = (metric, label)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, metric, label, value):
+        with self.lock:
+            histogram = self.histograms.get((metric, label))
+            if histogram is None:
+                histogram = self.histograms[(metric, label)] = Histogram()
+            histogram.observe(value)
+
+    # one rpc: latency, bytes on the wire and whether it failed
+    def record_rpc(self, call, latency, sent, received, error=False):
+        with self.lock:
+            for metric, value in (
+                ("rpc_calls", 1),
+                ("rpc_errors", int(error)),
+                ("rpc_bytes_sent", sent),
+                ("rpc_bytes_received", received),
+            ):
+                self.counters[(metric, call)] = (
+                    self.counters.get((metric, call), 0) + value
+                )
+            histogram = self.histograms.get(("rpc_latency", call))
+            if histogram is None:
+                histogram = self.histograms[("rpc_latency", call)] = Histogram()
+            histogram.observe(latency)
+
+    # one lookup in a memoized cache (country, state...)
+    def cache_lookup(self, cache, hit):
+        self.count("cache_hits" if hit else "cache_misses", cache)
+
+    # rows that went through a stage of the import (read, valid, created...)
+    def count_rows(self, stage, rows=1):
+        now = time.monotonic()
+        with self.lock:
+            key = ("rows", stage)
+            self.counters[key] = self.counters.get(key, 0) + rows
+            times = self.stage_times.setdefault(stage, [now, now])
+            times[1] = now
+
+    # time a block of work (load the snapshot, parse the csv...)
+    @contextmanager
+    def timed(self, stage):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", stage, time.monotonic() - started)
+
+    # rows per second of every stage, from its first row to its last one
+    def stage_rates(self):
+        rates = {}
+        with self.lock:
+            for stage, (first, last) in self.stage_times.items():
+                rows = self.counters.get(("rows", stage), 0)
+                elapsed = (last - first) or (time.monotonic() - self.started)
+                rates[stage] = rows / elapsed if elapsed else 0.0
+        return rates
+
+    # everything as a json-friendly dict
+    def report(self):
+        rates = self.stage_rates()
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+
+        rpc = {}
+        for (metric, call), value in counters.items():
+            if metric.startswith("rpc_"):
+                rpc.setdefault(call, {})[metric[4:]] = value
+        for (metric, label), histogram in histograms.items():
+            stats = {
+                "count": histogram.count,
+                "sum_seconds": round(histogram.sum, 6),
+                "p50_seconds": histogram.quantile(0.5),
+                "p95_seconds": histogram.quantile(0.95),
+                "p99_seconds": histogram.quantile(0.99),
+            }
+            if metric == "rpc_latency":
+                rpc.setdefault(label, {})["latency"] = stats
+
+        caches = {}
+        for (metric, cache), value in counters.items():
+            if metric in ("cache_hits", "cache_misses"):
+                caches.setdefault(cache, {"hits": 0, "misses": 0})[metric[6:]] = value
+        for stats in caches.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+
+        stages = {
+            stage: {
+                "rows": counters.get(("rows", stage), 0),
+                "rows_per_second": round(rates.get(stage, 0.0), 1),
+            }
+            for stage in rates
+        }
+        for (metric, stage), histogram in histograms.items():
+            if metric == "stage_seconds":
+                stages.setdefault(stage, {})["seconds"] = round(histogram.sum, 3)
+
+        return {
+            "elapsed_seconds": round(time.monotonic() - self.started, 3),
+            "rpc": rpc,
+            "caches": caches,
+            "stages": stages,
+        }
+
+    # everything in the prometheus text exposition format (node_exporter textfile)
+    def to_prometheus(self):
+        rates = self.stage_rates()
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+        label_names = {"rpc": "call", "cache": "cache", "rows": "stage"}
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (metric, label), value in counters:
+            label_name = label_names[metric.split("_")[0]]
+            name = f"{PROMETHEUS_PREFIX}_{metric}_total"
+            declare(name, "counter")
+            lines.append(f'{name}{{{label_name}="{label}"}} {value}')
+
+        for (metric, label), histogram in histograms:
+            label_name = "call" if metric == "rpc_latency" else "stage"
+            name = f"{PROMETHEUS_PREFIX}_{metric}"
+            if metric == "rpc_latency":
+                name += "_seconds"
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{name}_sum{{{label_name}="{label}"}} {histogram.sum}')
+            lines.append(f'{name}_count{{{label_name}="{label}"}} {histogram.count}')
+
+        name = f"{PROMETHEUS_PREFIX}_rows_per_second"
+        for stage, rate in sorted(rates.items()):
+            declare(name, "gauge")
+            lines.append(f'{name}{{stage="{stage}"}} {rate:.3f}')
+
+        name = f"{PROMETHEUS_PREFIX}_elapsed_seconds"
+        declare(name, "gauge")
+        lines.append(f"{name} {time.monotonic() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    # mean latency of every rpc recorded so far, in seconds (0.0 before any call)
+    def mean_rpc_latency(self):
+        with self.lock:
+            latencies = [
+                histogram
+                for (metric, _), histogram in self.histograms.items()
+                if metric == "rpc_latency"
+            ]
+            count = sum(histogram.count for histogram in latencies)
+            total = sum(histogram.sum for histogram in latencies)
+        return total / count if count else 0.0
+
+    # one short line with the row counts and rates of every stage
+    def progress_line(self):
+        rates = self.stage_rates()
+        with self.lock:
+            rows = {stage: self.counters.get(("rows", stage), 0) for stage in rates}
+        return ", ".join(
+            f"{stage}: {rows[stage]} ({rates[stage]:.0f}/s)" for stage in rates
+        )
+
+
+# metrics of the current run, shared by every module of the importer
+metrics = Metrics()
+
+
+# settings of the transport of every MeteredServerProxy (set by app2.py):
+# gzip_min_size - request bodies bigger than this many bytes are sent compressed
+# (Content-Encoding: gzip); None sends them as they are. Odoo itself does not
+# inflate requests, so only for a proxy in front of it that does.
+# gzip_level - compression level of the requests (1 is the cheapest)
+# Compressed responses are always accepted (xmlrpc.client sends Accept-Encoding:
+# gzip and decodes them), so a proxy that gzips text/xml shrinks them too.
+transport_settings = {"gzip_min_size": None, "gzip_level": 1}
+
+
+# xmlrpc transport that counts the bytes sent and received on the wire, after
+# the gzip compression of the requests and before the decoding of the responses
+class _CountingResponse:
+    def __init__(self, response, transport):
+        self.response = response
+        self.transport = transport
+
+    def read(self, *args):
+        data = self.response.read(*args)
+        self.transport.bytes_received += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class _CountingMixin:
+    bytes_sent = 0
+    bytes_received = 0
+    gzip_min_size = None
+    gzip_level = 1
+
+    def send_content(self, connection, request_body):
+        if self.gzip_min_size is not None and len(request_body) > self.gzip_min_size:
+            connection.putheader("Content-Encoding", "gzip")
+            request_body = gzip.compress(request_body, self.gzip_level)
+        self.bytes_sent += len(request_body)
+        super().send_content(connection, request_body)
+
+    def parse_response(self, response):
+        return super().parse_response(_CountingResponse(response, self))
+
+
+class CountingTransport(_CountingMixin, xmlrpc.client.Transport):
+    pass
+
+
+class CountingSafeTransport(_CountingMixin, xmlrpc.client.SafeTransport):
+    pass
+
+
+# name of an rpc in the metrics: "res.partner.create", "common.authenticate"...
+def rpc_label(service, method, args):
+    if method == "execute_kw" and len(args) >= 5:
+        return f"{args[3]}.{args[4]}"
+    return f"{service}.{method}"
+
+
+# drop-in replacement for ServerProxy that records every call in the metrics.
+# Like ServerProxy it is not thread-safe: use one instance per thread.
+class MeteredServerProxy:
+    def __init__(self, uri, registry=None, **kwargs):
+        transport_class = (
+            CountingSafeTransport if uri.startswith("https") else CountingTransport
+        )
+        self.transport = transport_class()
+        self.transport.gzip_min_size = transport_settings["gzip_min_size"]
+        self.transport.gzip_level = transport_settings["gzip_level"]
+        self.proxy = xmlrpc.client.ServerProxy(uri, transport=self.transport, **kwargs)
+        self.service = uri.rstrip("/").rsplit("/", 1)[-1]
+        self.registry = registry or metrics
+
+    def __getattr__(self, name):
+        method = getattr(self.proxy, name)
+
+        def call(*args):
+            sent = self.transport.bytes_sent
+            received = self.transport.bytes_received
+            started = time.monotonic()
+            error = False
+            try:
+                return method(*args)
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.registry.record_rpc(
+                    rpc_label(self.service, name, args),
+                    time.monotonic() - started,
+                    self.transport.bytes_sent - sent,
+                    self.transport.bytes_received - received,
+                    error,
+                )
+
+        return call
+
+
+# log a progress line every interval seconds until the returned stop() is called
+def start_progress(interval, registry=None):
+    registry = registry or metrics
+    stopped = threading.Event()
+    if interval <= 0:
+        return stopped.set
+
+    def run():
+        while not stopped.wait(interval):
+            logger.info(f"Progresso: {registry.progress_line()}")
+
+    threading.Thread(target=run, daemon=True).start()
+    return stopped.set
+
+
+# save the json report and/or the prometheus text file of the run
+def write_reports(json_file=None, prometheus_file=None, registry=None):
+    registry = registry or metrics
+    if json_file:
+        with open(json_file, "w", encoding="utf-8") as file:
+            json.dump(registry.report(), file, indent=2)
+    if prometheus_file:
+        # write then rename, so the textfile collector never reads half a file
+        temp_file = f"{prometheus_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as file:
+            file.write(registry.to_prometheus())
+        os.replace(temp_file, prometheus_file)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of a cached value changes: older entries are ignored
+CACHE_VERSION = 1
+
+# seconds each kind of entry stays valid (0 disables the cache for it)
+DEFAULT_TTLS = {
+    # uid of the authenticated user
+    "auth": 24 * 3600,
+    # country and state tables, which hardly ever change
+    "reference_data": 7 * 24 * 3600,
+    # partner dedupe snapshot: synced incrementally on every run while valid and
+    # downloaded again once expired (the incremental sync misses deleted partners)
+    "partners": 24 * 3600,
+}
+
+# rounds of the key derivation of the cached uids: slow on purpose, so the keys in
+# the cache file are no shortcut to brute-force the odoo password
+AUTH_KEY_ITERATIONS = 200_000
+
+
+# persistent cache of the setup data of an import, in a sqlite file shared by all
+# the runs: one row per (url, db, name) with the json value, the cache version and
+# the time it was saved. An entry is only returned while it is younger than the
+# ttl of its kind and has the current CACHE_VERSION. The connection can be used
+# from any thread (the async strategy loads the dedupe index on its producer
+# thread), one call at a time.
+class LocalCache:
+    def __init__(self, file_name, url, db, ttls=None):
+        self.url = url
+        self.db = db
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "url TEXT, db TEXT, name TEXT, version INTEGER, saved_at REAL, "
+                "value TEXT, PRIMARY KEY (url, db, name))"
+            )
+            self.connection.execute("CREATE TABLE IF NOT EXISTS secret (salt BLOB)")
+            row = self.connection.execute("SELECT salt FROM secret").fetchone()
+            if row:
+                self.salt = row[0]
+            else:
+                # random salt of this cache file; the uids cached under the old
+                # unsalted keys are dropped
+                self.salt = os.urandom(16)
+                self.connection.execute("INSERT INTO secret VALUES (?)", (self.salt,))
+                self.connection.execute("DELETE FROM cache WHERE name LIKE 'auth:%'")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # the cached value of name (its kind is the part before ":"), or None
+    def get(self, name):
+        ttl = self.ttls.get(name.split(":")[0], 0)
+        if not ttl:
+            return None
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT version, saved_at, value FROM cache "
+                "WHERE url = ? AND db = ? AND name = ?",
+                (self.url, self.db, name),
+            ).fetchone()
+        if not row:
+            return None
+
+        version, saved_at, value = row
+        if version != CACHE_VERSION or time.time() - saved_at > ttl:
+            logger.info(f"Cache local expirado: {name}")
+            return None
+        return json.loads(value)
+
+    # save the value of name, replacing the previous one; saved_at keeps the time
+    # of the first save when refresh is False (values synced incrementally)
+    def set(self, name, value, refresh=True):
+        saved_at = time.time()
+        value = json.dumps(value, separators=(",", ":"))
+        with self.lock:
+            if not refresh:
+                row = self.connection.execute(
+                    "SELECT saved_at FROM cache WHERE url = ? AND db = ? "
+                    "AND name = ? AND version = ?",
+                    (self.url, self.db, name, CACHE_VERSION),
+                ).fetchone()
+                if row:
+                    saved_at = row[0]
+
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.url, self.db, name, CACHE_VERSION, saved_at, value),
+                )
+
+    # drop every entry of this url and database
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM cache WHERE url = ? AND db = ?", (self.url, self.db)
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    # cache key of a user's uid, derived with the salt of the file (pbkdf2): a
+    # password change makes the cached uid unreachable
+    def auth_key(self, username, password):
+        digest = hashlib.pbkdf2_hmac(
+            "sha256",
+            f"{username}\0{password}".encode("utf-8"),
+            self.salt,
+            AUTH_KEY_ITERATIONS,
+        )
+        return f"auth:{digest.hex()}"
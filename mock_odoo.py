@@ -0,0 +1,366 @@
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import xmlrpc.client
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# reference data seeded in the mock database
+MOCK_COUNTRIES = [
+    ("Belgium", "BE"),
+    ("Brazil", "BR"),
+    ("Canada", "CA"),
+    ("France", "FR"),
+    ("Germany", "DE"),
+    ("Ireland", "IE"),
+    ("Italy", "IT"),
+    ("Netherlands", "NL"),
+    ("Spain", "ES"),
+    ("United States", "US"),
+]
+MOCK_STATES = [
+    ("Brazil", "São Paulo", "SP"),
+    ("Brazil", "Rio de Janeiro", "RJ"),
+    ("Canada", "Ontario", "ON"),
+    ("United States", "California", "CA"),
+    ("United States", "New York", "NY"),
+]
+
+
+# current time in the format odoo uses for write_date
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# compare a record value with a domain leaf
+def _match_leaf(record, leaf):
+    field, operator, value = leaf
+    current = record.get(field, False)
+    if isinstance(current, list) and len(current) == 2:
+        current = current[0]  # many2one as [id, name]
+
+    if operator == "=":
+        return current == value
+    if operator == "!=":
+        return current != value
+    if operator == "in":
+        return current in value
+    if operator == "not in":
+        return current not in value
+    if operator == ">":
+        return current is not False and current > value
+    if operator == ">=":
+        return current is not False and current >= value
+    if operator == "<":
+        return current is not False and current < value
+    if operator == "<=":
+        return current is not False and current <= value
+    if operator == "=ilike":
+        return str(current).lower() == str(value).lower()
+    if operator == "ilike":
+        return str(value).lower() in str(current or "").lower()
+    raise ValueError(f"Operador não suportado: {operator}")
+
+
+# evaluate an odoo domain in polish notation ("&", "|", "!" and implicit and)
+def match_domain(record, domain):
+    # evaluate the term starting at position and return (result, next position)
+    def evaluate(position):
+        term = domain[position]
+        if term == "!":
+            result, position = evaluate(position + 1)
+            return not result, position
+        if term in ("&", "|"):
+            left, position = evaluate(position + 1)
+            right, position = evaluate(position)
+            return (left and right) if term == "&" else (left or right), position
+        return _match_leaf(record, term), position + 1
+
+    position = 0
+    while position < len(domain):
+        result, position = evaluate(position)
+        if not result:
+            return False
+    return True
+
+
+# in-memory stand-in for the odoo models used by the importer
+class MockOdooDatabase:
+    def __init__(self, failure_rate=0.0, fault_rate=0.0):
+        self.lock = threading.Lock()
+        self.failure_rate = failure_rate
+        self.fault_rate = fault_rate
+        self.tables = {"res.partner": {}, "res.country": {}, "res.country.state": {}}
+        self.next_ids = {model: 1 for model in self.tables}
+        self.calls = {}
+
+        country_ids = {}
+        for name, code in MOCK_COUNTRIES:
+            country_ids[name] = self._insert("res.country", {"name": name, "code": code})
+        for country, name, code in MOCK_STATES:
+            self._insert(
+                "res.country.state",
+                {"name": name, "code": code, "country_id": [country_ids[country], country]},
+            )
+
+    def _insert(self, model, vals):
+        record_id = self.next_ids[model]
+        self.next_ids[model] += 1
+        record = dict(vals, id=record_id, write_date=_now())
+        self.tables[model][record_id] = record
+        return record_id
+
+    def _search(self, model, domain, offset=0, limit=None, order=None):
+        records = [r for r in self.tables[model].values() if match_domain(r, domain)]
+        if order:
+            field, _, direction = order.partition(" ")
+            records.sort(
+                key=lambda r: (r.get(field) is False, r.get(field)),
+                reverse=direction.strip().lower() == "desc",
+            )
+        end = offset + limit if limit else None
+        return records[offset:end]
+
+    # dispatch an execute_kw call to the in-memory table
+    def execute_kw(self, model, method, args, kwargs=None):
+        kwargs = kwargs or {}
+        if model not in self.tables:
+            raise xmlrpc.client.Fault(2, f"Modelo desconhecido: {model}")
+        if self.fault_rate and random.random() < self.fault_rate:
+            raise xmlrpc.client.Fault(1, "Falha injetada pelo servidor de teste")
+
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+            if method == "create":
+                vals = args[0]
+                if isinstance(vals, dict):
+                    return self._insert(model, vals)
+                return [self._insert(model, v) for v in vals]
+
+            if method == "write":
+                ids, vals = args
+                for record_id in ids:
+                    self.tables[model][record_id].update(vals, write_date=_now())
+                return True
+
+            if method in ("search", "search_read", "search_count"):
+                domain = args[0] if args else kwargs.get("domain", [])
+                records = self._search(
+                    model,
+                    domain,
+                    kwargs.get("offset", 0),
+                    kwargs.get("limit"),
+                    kwargs.get("order"),
+                )
+                if method == "search_count":
+                    return len(records)
+                if method == "search":
+                    return [r["id"] for r in records]
+                fields = kwargs.get("fields")
+                if not fields:
+                    return [dict(r) for r in records]
+                return [
+                    {"id": r["id"], **{f: r.get(f, False) for f in fields}}
+                    for r in records
+                ]
+
+            if method == "read":
+                ids = args[0]
+                fields = kwargs.get("fields") or (args[1] if len(args) > 1 else None)
+                records = [self.tables[model][i] for i in ids if i in self.tables[model]]
+                if not fields:
+                    return [dict(r) for r in records]
+                return [
+                    {"id": r["id"], **{f: r.get(f, False) for f in fields}}
+                    for r in records
+                ]
+
+        raise xmlrpc.client.Fault(2, f"Método não suportado: {method}")
+
+    # dispatch a call of the "common" or "object" service
+    def dispatch(self, service, method, args):
+        if service == "common":
+            if method == "authenticate":
+                return 2
+            if method == "version":
+                return {"server_version": "mock"}
+        if service == "object" and method == "execute_kw":
+            _, _, _, model, model_method, *rest = args
+            return self.execute_kw(
+                model, model_method, rest[0] if rest else [], rest[1] if len(rest) > 1 else {}
+            )
+        raise xmlrpc.client.Fault(2, f"Serviço não suportado: {service}.{method}")
+
+
+# http handler for /xmlrpc/2/common, /xmlrpc/2/object and /jsonrpc
+class MockOdooHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # buffer the response, so the headers and the body leave in one send (flushed
+    # after each request), and disable nagle: otherwise every keep-alive rpc waits
+    # ~40ms for the delayed ack of the client between the headers and the body
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # send the response (gzipped when the server compresses and the client accepts
+    # it) and return its size on the wire
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if self.server.compression and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, 1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def do_POST(self):
+        server = self.server
+        started = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        received = len(body)
+        # like a proxy that inflates the requests in front of odoo
+        if server.compression and self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        if server.latency:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        if server.database.failure_rate and random.random() < server.database.failure_rate:
+            sent = self._send(503, b"Service Unavailable", "text/plain")
+            server.record(started, received, sent)
+            return
+
+        if self.path.startswith("/xmlrpc/2/"):
+            service = self.path.rsplit("/", 1)[-1]
+            args, method = xmlrpc.client.loads(body, use_builtin_types=True)
+            try:
+                result = xmlrpc.client.dumps(
+                    (server.database.dispatch(service, method, args),),
+                    methodresponse=True,
+                    allow_none=True,
+                )
+            except xmlrpc.client.Fault as fault:
+                result = xmlrpc.client.dumps(fault, allow_none=True)
+            response = result.encode("utf-8")
+            sent = self._send(200, response, "text/xml")
+
+        elif self.path == "/jsonrpc":
+            request = json.loads(body)
+            params = request["params"]
+            try:
+                result = {
+                    "result": server.database.dispatch(
+                        params["service"], params["method"], params["args"]
+                    )
+                }
+            except xmlrpc.client.Fault as fault:
+                result = {
+                    "error": {
+                        "code": 200,
+                        "message": "Odoo Server Error",
+                        "data": {"message": fault.faultString},
+                    }
+                }
+            result.update(jsonrpc="2.0", id=request.get("id"))
+            response = json.dumps(result).encode("utf-8")
+            sent = self._send(200, response, "application/json")
+
+        else:
+            response = b"Not Found"
+            sent = self._send(404, response, "text/plain")
+
+        server.record(started, received, sent)
+
+
+# threaded mock server that also records rpc count, bytes and latencies
+class MockOdooServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, address, latency=0.0, jitter=0.0, failure_rate=0.0, fault_rate=0.0,
+        compression=False,
+    ):
+        super().__init__(address, MockOdooHandler)
+        # gzip requests and responses, as behind a proxy that handles them
+        self.compression = compression
+        self.database = MockOdooDatabase(failure_rate, fault_rate)
+        self.latency = latency
+        self.jitter = jitter
+        self.stats_lock = threading.Lock()
+        self.latencies = []
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, started, received, sent):
+        with self.stats_lock:
+            self.latencies.append(time.perf_counter() - started)
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    # rpc count, per-method calls, bytes and latency percentiles (in ms)
+    def stats(self):
+        with self.stats_lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                "rpc_count": len(latencies),
+                "calls": dict(self.database.calls),
+                "bytes_received": self.bytes_received,
+                "bytes_sent": self.bytes_sent,
+            }
+        for name, percentile in (("p50_ms", 0.50), ("p99_ms", 0.99)):
+            stats[name] = (
+                round(latencies[int(percentile * (len(latencies) - 1))] * 1000, 3)
+                if latencies
+                else 0.0
+            )
+        return stats
+
+
+# start the mock server on a background thread and return it
+def start_mock_server(host="127.0.0.1", port=0, **options):
+    server = MockOdooServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor Odoo simulado para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8069)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos por RPC")
+    parser.add_argument("--jitter", type=float, default=0.0, help="segundos extras aleatórios")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fração de HTTP 503")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="fração de Faults")
+    parser.add_argument("--gzip", action="store_true", help="pedidos e respostas com gzip")
+    args = parser.parse_args()
+
+    server = MockOdooServer(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        fault_rate=args.fault_rate,
+        compression=args.gzip,
+    )
+    print(f"Servidor Odoo simulado em {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise
+from contact_mapping import make_row_mapper
+from instrumentation import metrics
+
+
+# read the header record and return (fieldnames, offset of the first data row)
+def read_header(file_name):
+    with open(file_name, mode="rb") as file:
+        # a quoted header may span lines: read until the quotes are balanced
+        header = file.readline()
+        while header.count(b'"') % 2 and (line := file.readline()):
+            header += line
+        offset = file.tell()
+
+    fieldnames = next(csv.reader(io.StringIO(header.decode("utf-8"), newline="")), [])
+    return fieldnames, offset
+
+
+# yield byte offsets that split the file into records of about chunk_size bytes,
+# starting at start (which must be a record boundary) and ending at the file size.
+# A newline only ends a record when the number of quotes before it is even, so
+# newlines inside quoted fields never split a row ("" escapes count twice).
+def iter_record_boundaries(file_name, start, chunk_size, block_size=1 << 20):
+    with open(file_name, mode="rb") as file:
+        file.seek(start)
+        yield start
+
+        last = start
+        target = start + chunk_size
+        position = start  # file offset of the current block
+        quoted = 0  # 1 when position is inside a quoted field
+        while block := file.read(block_size):
+            end = position + len(block)
+            index = max(target - position, 0)
+            inside = quoted ^ (block.count(b'"', 0, index) & 1)
+
+            while target < end:
+                newline = block.find(b"\n", index)
+                if newline == -1:
+                    break
+
+                inside ^= block.count(b'"', index, newline) & 1
+                index = newline + 1
+                if not inside:
+                    last = position + index
+                    yield last
+                    target = last + chunk_size
+                    # skip to the next target, keeping track of the quotes
+                    skip_to = max(target - position, index)
+                    inside ^= block.count(b'"', index, skip_to) & 1
+                    index = skip_to
+
+            quoted ^= block.count(b'"') & 1
+            position = end
+
+    if position > last:
+        yield position
+
+
+# parse the bytes start..end of the file (whole records) into contacts; runs in
+# the worker processes
+def parse_chunk(task):
+    file_name, start, end, fieldnames = task
+    with open(file_name, mode="rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode("utf-8")
+
+    map_row = make_row_mapper(fieldnames)
+    # blank lines are not records, as in read_csv_rows
+    return [
+        map_row(values)
+        for values in csv.reader(io.StringIO(text, newline=""))
+        if values
+    ]
+
+
+# parse the csv on a pool of processes and yield (row_index, contact) in the file
+# order, like read_csv_rows followed by row_to_contact. At most two chunks per
+# worker are parsed ahead of the consumer, so the memory stays bounded.
+# progress holds the start of the chunk being consumed (offset) and the last row
+# before it (row_index): a checkpoint taken there resumes from the chunk start, and
+# the rows of that chunk already created are caught by the odoo dedupe index.
+def read_contacts_parallel(
+    file_name,
+    workers=None,
+    chunk_size=4 << 20,
+    progress=None,
+    start_offset=0,
+    start_row=0,
+):
+    workers = workers or os.cpu_count() or 1
+    if progress is None:
+        progress = {}
+    progress.update(row_index=start_row, offset=start_offset)
+
+    fieldnames, header_end = read_header(file_name)
+    if not fieldnames:
+        return
+
+    boundaries = iter_record_boundaries(
+        file_name, start_offset or header_end, chunk_size
+    )
+    row_index = start_row
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            chunks = pairwise(boundaries)
+            while True:
+                # keep the pool busy with the next chunks
+                while len(pending) < workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    start, end = chunk
+                    future = executor.submit(
+                        parse_chunk, (file_name, start, end, fieldnames)
+                    )
+                    pending.append((start, future))
+
+                if not pending:
+                    break
+
+                start, future = pending.popleft()
+                contacts = future.result()
+                progress.update(row_index=row_index, offset=start)
+                metrics.count_rows("read", len(contacts))
+
+                for contact in contacts:
+                    row_index += 1
+                    yield row_index, contact
+
+        finally:
+            for _, future in pending:
+                future.cancel()
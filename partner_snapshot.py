@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+from get_ids import iter_existing_contacts
+from contact_index import new_contact_index, add_to_contact_index
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ["name", "email", "write_date"]
+
+
+# read the snapshot saved by a previous run, if it belongs to the same url and database
+def read_snapshot(cache_file, url, db):
+    try:
+        with open(cache_file, encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if snapshot.get("url") != url or snapshot.get("db") != db:
+        return None
+    return snapshot
+
+
+# write the snapshot atomically, so a crash never leaves a half-written file
+def write_snapshot(cache_file, snapshot):
+    temp_file = f"{cache_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        json.dump(snapshot, file, separators=(",", ":"))
+    os.replace(temp_file, cache_file)
+
+
+# build the dedupe index from the snapshot partners ({id: [name, email]})
+def snapshot_to_index(partners, match_mode="exact"):
+    index = new_contact_index(match_mode)
+    for partner_id, (name, email) in partners.items():
+        add_to_contact_index(index, {"name": name, "email": email}, int(partner_id))
+    return index
+
+
+# fetch the existing partners page by page straight into the dedupe index.
+# With a cache_file (or a LocalCache, which takes precedence), the partners are
+# also saved on disk with the highest write_date, and later runs only fetch the
+# partners changed since then. Partners deleted in odoo are not detected by the
+# incremental sync; remove the cache file to force a full download (the
+# LocalCache downloads everything again once its "partners" ttl expires).
+def load_contact_index(
+    models,
+    db,
+    uid,
+    password,
+    url,
+    cache_file=None,
+    page_size=5000,
+    cache=None,
+    match_mode="exact",
+):
+    if not cache_file and not cache:
+        index = new_contact_index(match_mode)
+        for partner in iter_existing_contacts(
+            models, db, uid, password, page_size=page_size
+        ):
+            add_to_contact_index(index, partner, partner["id"])
+        return index
+
+    snapshot = cache.get("partners") if cache else read_snapshot(cache_file, url, db)
+    if snapshot:
+        # changed partners are fetched without the name/email filter, so the ones
+        # that lost their email are dropped from the snapshot too
+        domain = [("write_date", ">=", snapshot["last_write_date"])]
+        partners = snapshot["partners"]
+        last_write_date = snapshot["last_write_date"]
+        logger.info(f"Atualizando contatos alterados desde {last_write_date}")
+    else:
+        domain = None
+        partners = {}
+        last_write_date = ""
+
+    for partner in iter_existing_contacts(
+        models, db, uid, password, domain, SNAPSHOT_FIELDS, page_size
+    ):
+        if partner["name"] and partner["email"]:
+            partners[str(partner["id"])] = [partner["name"], partner["email"]]
+        else:
+            partners.pop(str(partner["id"]), None)
+
+        if partner.get("write_date") and partner["write_date"] > last_write_date:
+            last_write_date = partner["write_date"]
+
+    if cache:
+        # the ttl counts from the last full download, not the last sync
+        cache.set(
+            "partners",
+            {"last_write_date": last_write_date, "partners": partners},
+            refresh=not snapshot,
+        )
+    else:
+        write_snapshot(
+            cache_file,
+            {
+                "url": url,
+                "db": db,
+                "last_write_date": last_write_date,
+                "partners": partners,
+            },
+        )
+    return snapshot_to_index(partners, match_mode)
@@ -0,0 +1,345 @@
+import csv
+import logging
+from contextlib import nullcontext
+from itertools import islice
+from contact_mapping import row_to_contact
+from parallel_csv import read_contacts_parallel
+from input_stream import STDIN, is_plain_file, open_input, skip_to
+from reference_data import load_reference_data, resolve_country_id, resolve_state_id
+from contact_index import (
+    add_to_contact_index,
+    find_in_contact_index,
+    new_contact_index,
+)
+from contact_lookup import load_dedupe_index
+from batch_create import create_partners_batch, update_partners_batch
+from companies import link_company_batches
+from resilient_rpc import ResilientModels
+from checkpoint import read_checkpoint, open_checkpoint, write_checkpoint
+from instrumentation import MeteredServerProxy, metrics
+
+logger = logging.getLogger(__name__)
+
+
+# default reporter: log the skipped, created and updated rows
+def log_result(status, row_index, contact, detail=None):
+    if status == "invalid":
+        logger.warning(
+            f"Registro inválido {row_index}, {contact['name']}, {contact['email']}"
+        )
+    elif status == "duplicate":
+        logger.info(
+            f"{contact['name']} ou o email {contact['email']} já existe no banco de dados."
+        )
+    elif status == "created":
+        logger.info(f"{contact['name']} criado com o ID: {detail}")
+    elif status == "updated":
+        logger.info(f"{contact['name']} atualizado: {', '.join(detail)}")
+    elif status == "unchanged":
+        logger.info(f"{contact['name']} já está atualizado no banco de dados.")
+    elif status == "failed" and contact.partner_id:
+        logger.error(f"Erro ao atualizar contato {contact['name']}: {detail}")
+    elif status == "failed":
+        logger.error(f"Erro ao criar contato {contact['name']}: {detail}")
+
+
+# read the csv lazily, one (row_index, row) at a time, from a file, a compressed
+# file or the standard input (input_stream.open_input). The offset in the csv
+# bytes after the last row read is kept in progress, so a checkpoint can skip
+# straight back to it.
+def read_csv_rows(file_name, progress=None, start_offset=0, start_row=0):
+    if progress is None:
+        progress = {}
+    progress.update(row_index=start_row, offset=0)
+
+    with open_input(file_name) as file:
+        # decode line by line counting the bytes; csv only pulls the lines it needs
+        def lines():
+            for line in file:
+                progress["offset"] += len(line)
+                yield line.decode("utf-8")
+
+        reader = csv.reader(lines())
+        fieldnames = next(reader, None)
+        if not fieldnames:
+            return
+
+        # the header was counted from 0: restart the count at the checkpoint
+        if start_offset:
+            skip_to(file, progress["offset"], start_offset)
+            progress["offset"] = start_offset
+
+        row_index = start_row
+        for values in reader:
+            # blank lines are not records (csv.DictReader skipped them too)
+            if not values:
+                continue
+            row_index += 1
+            progress["row_index"] = row_index
+            metrics.count_rows("read")
+            yield row_index, dict(zip(fieldnames, values))
+
+
+# drop the duplicates inside the csv (first one wins) and the invalid contacts,
+# compared as in the dedupe against odoo (match_mode, see contact_index).
+# Runs in the file order, also when the rows were parsed in parallel.
+def filter_contacts(contacts, report=log_result, match_mode="exact"):
+    # index of the contacts already seen, to avoid duplicated contacts
+    seen_contacts = new_contact_index(match_mode)
+
+    for row_index, contact in contacts:
+        # check if the name or email was already seen
+        if find_in_contact_index(seen_contacts, contact):
+            continue
+
+        add_to_contact_index(seen_contacts, contact)
+
+        if not contact["name"] or not contact["email"]:
+            report("invalid", row_index, contact)
+            continue
+
+        metrics.count_rows("valid")
+        yield row_index, contact
+
+
+# drop the contacts that already exist in the odoo database. In upsert mode they
+# go on with the matched partner in contact.partner_id, to be updated; only the
+# first row matching a partner updates it. existing_contacts_index may be a
+# callable, only called when the first row gets here (lazy loading).
+def dedupe_contacts(contacts, existing_contacts_index, report=log_result, upsert=False):
+    matched_ids = set()
+    for row_index, contact in contacts:
+        if callable(existing_contacts_index):
+            existing_contacts_index = existing_contacts_index()
+
+        partner_id = find_in_contact_index(existing_contacts_index, contact)
+        if partner_id:
+            if not upsert or partner_id in matched_ids:
+                report("duplicate", row_index, contact)
+                continue
+
+            matched_ids.add(partner_id)
+            contact.partner_id = partner_id
+            metrics.count_rows("matched")
+            yield row_index, contact
+            continue
+
+        metrics.count_rows("new")
+        yield row_index, contact
+
+
+# replace the country and state names with their ids
+def resolve_references(contacts, reference_data):
+    for row_index, contact in contacts:
+        country_id = resolve_country_id(reference_data, contact["country_id"])
+        state_id = resolve_state_id(reference_data, country_id, contact["state_id"])
+
+        contact["state_id"] = state_id or ""
+        contact["country_id"] = country_id or ""
+
+        yield row_index, contact
+
+
+# group the stream into lists of at most batch_size items; batch_size may be a
+# callable, read again for every batch (adaptive batch sizing)
+def batched(items, batch_size):
+    items = iter(items)
+    while batch := list(
+        islice(items, batch_size() if callable(batch_size) else batch_size)
+    ):
+        yield batch
+
+
+# create the new contacts of each batch with a single rpc, update the matched ones
+# (upsert mode) with grouped writes and report every row
+def create_batches(models, db, uid, password, batches, report=log_result):
+    for batch in batches:
+        new = []
+        matched = []
+        for row_index, contact in batch:
+            (matched if contact.partner_id else new).append((row_index, contact))
+
+        created_ids = []
+        if new:
+            results = create_partners_batch(
+                models, db, uid, password, [contact for _, contact in new]
+            )
+            for (row_index, _), (contact, contact_id, error) in zip(new, results):
+                if error:
+                    metrics.count_rows("failed")
+                    report("failed", row_index, contact, error)
+                else:
+                    report("created", row_index, contact, contact_id)
+                    created_ids.append(contact_id)
+            metrics.count_rows("created", len(created_ids))
+
+        if matched:
+            results = update_partners_batch(
+                models, db, uid, password, [contact for _, contact in matched]
+            )
+            for (row_index, _), (contact, changes, error) in zip(matched, results):
+                if error:
+                    metrics.count_rows("failed")
+                    report("failed", row_index, contact, error)
+                elif changes:
+                    metrics.count_rows("updated")
+                    report("updated", row_index, contact, sorted(changes))
+                else:
+                    metrics.count_rows("unchanged")
+                    report("unchanged", row_index, contact)
+
+        yield len(batch), created_ids
+
+
+# the read-only part of an import, shared with the plan mode: load the dedupe index
+# and the reference tables and chain read -> validate -> skip unchanged rows (with
+# a FingerprintStore) -> dedupe -> resolve. A warm contact_index and
+# reference_data (daemon mode) are used as they are instead of being loaded.
+# Returns the lazy stream of (row_index, contact) and the reference data.
+def prepare_contacts(
+    models,
+    db,
+    uid,
+    password,
+    url,
+    file_name,
+    report=log_result,
+    snapshot_file=None,
+    page_size=5000,
+    parse_workers=1,
+    parse_chunk_size=4 << 20,
+    upsert=False,
+    progress=None,
+    start_offset=0,
+    start_row=0,
+    cache=None,
+    match_mode="exact",
+    lookup="auto",
+    fingerprints=None,
+    contact_index=None,
+    reference_data=None,
+):
+    def load_index():
+        with metrics.timed("get_existing_contacts"):
+            return load_dedupe_index(
+                models, db, uid, password, url, file_name, snapshot_file, page_size,
+                cache, match_mode, lookup,
+            )
+
+    # a delta import only loads the partners once a new or changed row shows up
+    existing_contacts_index = contact_index or (
+        load_index if fingerprints else load_index()
+    )
+    if reference_data is None:
+        reference_data = load_reference_data(models, db, uid, password, cache)
+
+    if parse_workers > 1 and is_plain_file(file_name):
+        # parse and normalize on a process pool, dedupe here in the file order
+        # (compressed and piped inputs can't be split, they are read in order)
+        contacts = read_contacts_parallel(
+            file_name,
+            parse_workers,
+            parse_chunk_size,
+            progress,
+            start_offset,
+            start_row,
+        )
+    else:
+        rows = read_csv_rows(file_name, progress, start_offset, start_row)
+        contacts = ((row_index, row_to_contact(row)) for row_index, row in rows)
+    # the skipped rows still count as seen for the duplicates inside the csv
+    contacts = filter_contacts(contacts, report, match_mode)
+    if fingerprints:
+        # rows imported before with the same values stop here (delta import)
+        contacts = fingerprints.skip_unchanged(contacts)
+    contacts = dedupe_contacts(contacts, existing_contacts_index, report, upsert)
+    contacts = resolve_references(contacts, reference_data)
+    return contacts, reference_data
+
+
+# stream the csv into odoo: read -> validate -> dedupe -> resolve -> batch ->
+# link companies (optional) -> batch-create. Memory is bounded by the batch size
+# and the dedupe indexes, not the file size.
+def run_import(
+    url,
+    db,
+    uid,
+    password,
+    file_name,
+    batch_size,
+    report=log_result,
+    snapshot_file=None,
+    page_size=5000,
+    resume=False,
+    limiter=None,
+    breaker=None,
+    parse_workers=1,
+    parse_chunk_size=4 << 20,
+    upsert=False,
+    companies=False,
+    cache=None,
+    match_mode="exact",
+    lookup="auto",
+    fingerprints=None,
+    contact_index=None,
+    reference_data=None,
+):
+    models = ResilientModels(
+        MeteredServerProxy(f"{url}/xmlrpc/2/object"), limiter, breaker
+    )
+
+    # the standard input can't be read again: no journal to resume from
+    journaled = file_name != STDIN
+    if resume and not journaled:
+        raise ValueError("A retomada (--resume) não funciona com a entrada padrão")
+
+    # resume right after the last committed batch of the checkpoint journal
+    checkpoint = read_checkpoint(file_name) if resume else None
+    if checkpoint:
+        logger.info(
+            f"Retomando a importação após o registro {checkpoint['row_index']}"
+        )
+    start_offset = checkpoint["offset"] if checkpoint else 0
+    start_row = checkpoint["row_index"] if checkpoint else 0
+
+    progress = {}
+    contacts, _ = prepare_contacts(
+        models,
+        db,
+        uid,
+        password,
+        url,
+        file_name,
+        report,
+        snapshot_file,
+        page_size,
+        parse_workers,
+        parse_chunk_size,
+        upsert,
+        progress,
+        start_offset,
+        start_row,
+        cache,
+        match_mode,
+        lookup,
+        fingerprints,
+        contact_index,
+        reference_data,
+    )
+
+    batches = batched(contacts, limiter.current_batch_size if limiter else batch_size)
+    if companies:
+        batches = link_company_batches(models, db, uid, password, batches)
+
+    total = 0
+    with open_checkpoint(file_name, resume) if journaled else nullcontext() as journal:
+        for sent, created_ids in create_batches(
+            models, db, uid, password, batches, report
+        ):
+            total += sent
+            # the reader stops right after the last row of the batch just created
+            if journal:
+                write_checkpoint(
+                    journal, progress["row_index"], progress["offset"], created_ids
+                )
+    return total
@@ -0,0 +1,109 @@
+import unicodedata
+from instrumentation import metrics
+
+
+# case-fold the name and strip the accents, so "São Paulo" and "sao paulo" match
+def fold_name(name):
+    name = unicodedata.normalize("NFKD", (name or "").strip())
+    return "".join(c for c in name if not unicodedata.combining(c)).casefold()
+
+
+# build the in-memory indexes by name, iso code and folded name
+def build_reference_data(countries, states):
+    reference_data = {
+        "countries": {"names": {}, "codes": {}, "folded": {}},
+        "states": {"names": {}, "codes": {}, "folded": {}},
+        # resolved lookups by the raw csv value, including the misses (False)
+        "country_lookups": {},
+        "state_lookups": {},
+    }
+
+    country_indexes = reference_data["countries"]
+    for country in countries:
+        country_indexes["names"].setdefault(country["name"], country["id"])
+        if country.get("code"):
+            country_indexes["codes"].setdefault(country["code"].upper(), country["id"])
+        country_indexes["folded"].setdefault(fold_name(country["name"]), country["id"])
+
+    # states are keyed together with the country, since names repeat across countries
+    state_indexes = reference_data["states"]
+    for state in states:
+        country_id = state["country_id"] and state["country_id"][0]
+        state_indexes["names"].setdefault((country_id, state["name"]), state["id"])
+        if state.get("code"):
+            state_indexes["codes"].setdefault(
+                (country_id, state["code"].upper()), state["id"]
+            )
+        state_indexes["folded"].setdefault(
+            (country_id, fold_name(state["name"])), state["id"]
+        )
+
+    return reference_data
+
+
+# fetch the full country and state tables with one search_read each, or take
+# them from the LocalCache while its "reference_data" entry is valid
+def load_reference_data(models, db, uid, password, cache=None):
+    cached = cache.get("reference_data") if cache else None
+    if cached:
+        return build_reference_data(cached["countries"], cached["states"])
+
+    with metrics.timed("load_reference_data"):
+        countries = models.execute_kw(
+            db, uid, password, "res.country", "search_read", [[]],
+            {"fields": ["name", "code"]},
+        )
+        states = models.execute_kw(
+            db, uid, password, "res.country.state", "search_read", [[]],
+            {"fields": ["name", "code", "country_id"]},
+        )
+    if cache:
+        cache.set("reference_data", {"countries": countries, "states": states})
+    return build_reference_data(countries, states)
+
+
+# get the country id by name, iso code or folded name (no rpc)
+def resolve_country_id(reference_data, country_name):
+    lookups = reference_data["country_lookups"]
+    if country_name in lookups:
+        metrics.cache_lookup("country", True)
+        return lookups[country_name]
+    metrics.cache_lookup("country", False)
+
+    name = (country_name or "").strip()
+    indexes = reference_data["countries"]
+    country_id = False
+    if name:
+        country_id = (
+            indexes["names"].get(name)
+            or indexes["codes"].get(name.upper())
+            or indexes["folded"].get(fold_name(name))
+            or False
+        )
+
+    lookups[country_name] = country_id
+    return country_id
+
+
+# get the state id of the given country by name, code or folded name (no rpc)
+def resolve_state_id(reference_data, country_id, state_name):
+    state_lookup_key = (country_id, state_name)
+    lookups = reference_data["state_lookups"]
+    if state_lookup_key in lookups:
+        metrics.cache_lookup("state", True)
+        return lookups[state_lookup_key]
+    metrics.cache_lookup("state", False)
+
+    name = (state_name or "").strip()
+    indexes = reference_data["states"]
+    state_id = False
+    if country_id and name:
+        state_id = (
+            indexes["names"].get((country_id, name))
+            or indexes["codes"].get((country_id, name.upper()))
+            or indexes["folded"].get((country_id, fold_name(name)))
+            or False
+        )
+
+    lookups[state_lookup_key] = state_id
+    return state_id
@@ -0,0 +1,243 @@
+import asyncio
+import http.client
+import logging
+import random
+import threading
+import time
+import xmlrpc.client
+
+logger = logging.getLogger(__name__)
+
+# http status codes of an overloaded or restarting server
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# database errors odoo reports as faults but that succeed when tried again
+RETRYABLE_FAULTS = ("could not serialize access", "deadlock detected")
+
+# http status codes of a request the server refused without running it
+REJECTED_STATUS = {429, 503}
+
+# methods that change the database: applying them twice is not harmless, and only
+# their latency drives the adaptive limiter (the batch size is the size of a create)
+WRITE_METHODS = {"create", "write", "unlink"}
+
+
+# tell whether the error is transient (retry) or fatal (bad data, bad credentials...)
+def is_retryable(error):
+    if isinstance(error, xmlrpc.client.ProtocolError):
+        return error.errcode in RETRYABLE_STATUS
+    if isinstance(error, xmlrpc.client.Fault):
+        return any(text in str(error.faultString) for text in RETRYABLE_FAULTS)
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+# tell whether the server surely did not apply the call: it refused it (429, 503,
+# connection refused) or rolled its transaction back (serialization faults). After
+# a reset, a timeout or a 500/502/504 the call may have been committed anyway.
+def was_rejected(error):
+    if isinstance(error, xmlrpc.client.ProtocolError):
+        return error.errcode in REJECTED_STATUS
+    if isinstance(error, xmlrpc.client.Fault):
+        return is_retryable(error)
+    return isinstance(error, ConnectionRefusedError)
+
+
+# exponential backoff with full jitter: a random wait up to base * 2^attempt
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+# circuit breaker: after failure_threshold consecutive failures the circuit opens and
+# every call waits reset_timeout before one trial call is let through (half-open)
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    # seconds the next call has to wait, 0 when it can go now
+    def wait_time(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0:
+                # half-open: let this call through, the next ones wait again
+                self.opened_at = time.monotonic()
+                return 0
+            return remaining
+
+    # block while the circuit is open, instead of hammering a failing server
+    def wait_until_closed(self):
+        while remaining := self.wait_time():
+            time.sleep(remaining)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.opened_at is None:
+                logger.warning(
+                    f"Circuito aberto após {self.failures} falhas seguidas, "
+                    f"aguardando {self.reset_timeout:.0f}s"
+                )
+                self.opened_at = time.monotonic()
+
+
+# AIMD controller for the batch size and the number of concurrent calls: both grow
+# additively while calls are fast and succeed, and are halved on errors or when
+# the latency goes over the target
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        batch_size=100,
+        min_batch_size=1,
+        max_batch_size=2000,
+        concurrency=4,
+        min_concurrency=1,
+        max_concurrency=32,
+        target_latency=5.0,
+        batch_step=50,
+    ):
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.batch_step = batch_step
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    # additive increase after a fast successful call
+    def record_success(self, latency):
+        if latency > self.target_latency:
+            self._decrease()
+            return
+        with self.condition:
+            self.batch_size = min(self.max_batch_size, self.batch_size + self.batch_step)
+            # one extra slot per "window" of successful calls
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+            self.condition.notify_all()
+
+    # multiplicative decrease after an error
+    def record_failure(self):
+        self._decrease()
+
+    def _decrease(self):
+        with self.condition:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+
+    # current batch size, used by the pipeline for every new batch
+    def current_batch_size(self):
+        return self.batch_size
+
+    # take one of the concurrency slots, waiting while the limit is reached
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.concurrency):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+# wrap a ServerProxy so every execute_kw is retried with backoff on transient errors
+# and goes through the circuit breaker; the writes also feed their latency to the
+# adaptive limiter. A create or write is only retried when the server surely did
+# not apply it (was_rejected): after a lost response the error is raised, so the
+# caller can check what was applied (create_partners_batch looks the rows up).
+class ResilientModels:
+    def __init__(self, models, limiter=None, breaker=None, max_retries=5):
+        self.models = models
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_retries = max_retries
+
+    def execute_kw(self, *args, **kwargs):
+        # execute_kw(db, uid, password, model, method, args, kwargs)
+        writes = len(args) > 4 and args[4] in WRITE_METHODS
+        limiter = self.limiter if writes else None
+        attempt = 0
+        while True:
+            if self.breaker:
+                self.breaker.wait_until_closed()
+
+            started = time.monotonic()
+            try:
+                result = self.models.execute_kw(*args, **kwargs)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    if self.breaker:
+                        self.breaker.record_failure()
+                    if limiter:
+                        limiter.record_failure()
+
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                if writes and not was_rejected(e):
+                    raise
+
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    f"Erro temporário no Odoo ({e}), nova tentativa em {delay:.1f}s"
+                )
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if self.breaker:
+                self.breaker.record_success()
+            if limiter:
+                limiter.record_success(time.monotonic() - started)
+            return result
+
+
+# ResilientModels.execute_kw for the async client: await attempt() (one call) with
+# the same retries, backoff, circuit breaker and write policy, without blocking
+# the event loop while waiting
+async def execute_async_with_retries(attempt, method, breaker=None, max_retries=5):
+    writes = method in WRITE_METHODS
+    retries = 0
+    while True:
+        if breaker:
+            while remaining := breaker.wait_time():
+                await asyncio.sleep(remaining)
+
+        try:
+            result = await attempt()
+        except Exception as e:
+            retryable = is_retryable(e)
+            if retryable and breaker:
+                breaker.record_failure()
+
+            if not retryable or retries >= max_retries:
+                raise
+            if writes and not was_rejected(e):
+                raise
+
+            delay = backoff_delay(retries)
+            logger.warning(
+                f"Erro temporário no Odoo ({e}), nova tentativa em {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            retries += 1
+            continue
+
+        if breaker:
+            breaker.record_success()
+        return result
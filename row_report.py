@@ -0,0 +1,94 @@
+import csv
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# columns of the csv report
+REPORT_FIELDS = ["status", "row_index", "name", "email", "detail"]
+
+# statuses in the order they are shown in the progress line
+STATUS_LABELS = {
+    "created": "criados",
+    "updated": "atualizados",
+    "unchanged": "sem alterações",
+    "duplicate": "duplicados",
+    "invalid": "inválidos",
+    "failed": "falhas",
+}
+
+
+# quiet reporter for big imports: every rejected, duplicate, created or failed row
+# (and updated or unchanged one in upsert mode) goes to a csv or ndjson file
+# (chosen by the extension) through a large write buffer, and the console only
+# gets a summary line every progress_interval seconds.
+# Without a file_name the rows are only counted. It has the same signature as the
+# per-row reporters, so it can be passed as report= to the import functions.
+class RowReport:
+    def __init__(
+        self, file_name=None, progress_interval=10.0, log=None, buffer_size=1 << 20
+    ):
+        self.file = None
+        self.csv_writer = None
+        if file_name:
+            self.file = open(
+                file_name, "w", encoding="utf-8", newline="", buffering=buffer_size
+            )
+            if file_name.endswith(".csv"):
+                self.csv_writer = csv.writer(self.file)
+                self.csv_writer.writerow(REPORT_FIELDS)
+
+        self.progress_interval = progress_interval
+        self.log = log or logger.info
+        # the upsert statuses only show up once they happen
+        self.counts = dict.fromkeys(["created", "duplicate", "invalid", "failed"], 0)
+        self.next_progress = time.monotonic() + progress_interval
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __call__(self, status, row_index, contact, detail=None):
+        self.counts[status] = self.counts.get(status, 0) + 1
+
+        if self.file:
+            detail = "" if detail is None else str(detail)
+            if self.csv_writer:
+                self.csv_writer.writerow(
+                    [status, row_index, contact["name"], contact["email"], detail]
+                )
+            else:
+                self.file.write(
+                    json.dumps(
+                        {
+                            "status": status,
+                            "row_index": row_index,
+                            "name": contact["name"],
+                            "email": contact["email"],
+                            "detail": detail,
+                        },
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+
+        if self.progress_interval and time.monotonic() >= self.next_progress:
+            self.next_progress = time.monotonic() + self.progress_interval
+            self.log(f"Progresso: {self.summary()}")
+
+    # counts by status: "criados: 10, duplicados: 2, ..."
+    def summary(self):
+        return ", ".join(
+            f"{STATUS_LABELS.get(status, status)}: {count}"
+            for status, count in self.counts.items()
+        )
+
+    # flush the report and show the final counts
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.log(f"Resumo: {self.summary()}")
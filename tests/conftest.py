@@ -0,0 +1,40 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# the importer modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_mapping import CONTACT_COLUMNS  # noqa: E402
+from mock_odoo import start_mock_server  # noqa: E402
+
+DB = "test"
+PASSWORD = "admin"
+# uid returned by the mock server to every authenticate
+UID = 2
+
+
+# a mock odoo server on a free port, shut down after the test
+@pytest.fixture
+def mock_server():
+    server = start_mock_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# write a csv with the importer columns; rows are (name, email) or full lists
+@pytest.fixture
+def write_csv(tmp_path):
+    def write(rows, name="contatos.csv", newline="\n"):
+        file_name = tmp_path / name
+        with open(file_name, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file, lineterminator=newline)
+            writer.writerow(CONTACT_COLUMNS)
+            for row in rows:
+                writer.writerow(list(row) + [""] * (len(CONTACT_COLUMNS) - len(row)))
+        return str(file_name)
+
+    return write
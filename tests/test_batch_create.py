@@ -0,0 +1,93 @@
+import xmlrpc.client
+
+from batch_create import create_partners_batch, update_partners_batch
+from contact_mapping import row_to_contact
+from conftest import DB, PASSWORD, UID
+
+
+# models that reject every create holding a contact without an email, like a
+# required field in odoo, and record the size of every create
+class RejectingModels:
+    def __init__(self, error=None):
+        self.calls = []
+        self.next_id = 1
+        self.error = error
+
+    def execute_kw(self, db, uid, password, model, method, args, kwargs=None):
+        vals_list = args[0]
+        self.calls.append(len(vals_list))
+        if self.error:
+            raise self.error
+        if any(not vals["email"] for vals in vals_list):
+            raise xmlrpc.client.Fault(1, "email obrigatório")
+        ids = list(range(self.next_id, self.next_id + len(vals_list)))
+        self.next_id += len(vals_list)
+        return ids
+
+
+def contacts(emails):
+    return [
+        row_to_contact({"Nome completo": f"Contato {index}", "E-mail": email})
+        for index, email in enumerate(emails)
+    ]
+
+
+def test_a_bad_row_only_fails_itself():
+    batch = contacts([f"c{index}@exemplo.com" for index in range(8)])
+    batch[5].email = ""
+    models = RejectingModels()
+
+    results = create_partners_batch(models, DB, UID, PASSWORD, batch)
+
+    assert [contact for contact, _, _ in results] == batch
+    failed = [position for position, (_, _, error) in enumerate(results) if error]
+    assert failed == [5]
+    created = [partner_id for _, partner_id, error in results if not error]
+    assert len(set(created)) == 7
+    # 8 fails, 4 good, 4 fails, 2 fails, 1 good, 1 bad, 2 good
+    assert models.calls == [8, 4, 4, 2, 1, 1, 2]
+
+
+def test_transient_errors_fail_the_batch_without_splitting():
+    error = xmlrpc.client.ProtocolError("http://odoo", 503, "Unavailable", {})
+    models = RejectingModels(error)
+
+    batch = contacts(["a@x.com"] * 4)
+
+    results = create_partners_batch(models, DB, UID, PASSWORD, batch)
+
+    assert models.calls == [4]
+    assert all(error is not None for _, _, error in results)
+
+
+def test_batch_against_the_mock_server(mock_server):
+    models = xmlrpc.client.ServerProxy(f"{mock_server.url}/xmlrpc/2/object")
+    batch = contacts([f"c{index}@exemplo.com" for index in range(5)])
+
+    results = create_partners_batch(models, DB, UID, PASSWORD, batch)
+
+    assert [error for _, _, error in results] == [None] * 5
+    partners = mock_server.database.tables["res.partner"]
+    assert [partners[partner_id]["email"] for _, partner_id, _ in results] == [
+        contact.email for contact in batch
+    ]
+
+
+# a re-import with blank company columns keeps the company block in odoo
+def test_upsert_keeps_the_company_block_of_blank_rows(mock_server):
+    models = xmlrpc.client.ServerProxy(f"{mock_server.url}/xmlrpc/2/object")
+    [full] = contacts(["ana@exemplo.com"])
+    full.company_name = "Empresa"
+    full.company_url = "https://empresa.com"
+    [(_, partner_id, _)] = create_partners_batch(models, DB, UID, PASSWORD, [full])
+
+    [blank] = contacts(["ana@exemplo.com"])
+    blank.function = "Diretora"
+    blank.partner_id = partner_id
+    assert blank.x_info_empresa == ""
+
+    [(_, changes, error)] = update_partners_batch(models, DB, UID, PASSWORD, [blank])
+    assert error is None
+    assert changes == {"function": "Diretora"}
+    stored = mock_server.database.tables["res.partner"][partner_id]
+    assert stored["x_info_empresa"] == full.x_info_empresa
@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from checkpoint import checkpoint_path, read_checkpoint
+from conftest import DB, PASSWORD, UID
+from pipeline import read_csv_rows, run_import
+
+CONTACTS = [(f"Contato {index}", f"contato{index}@exemplo.com") for index in range(35)]
+
+
+class Crash(Exception):
+    pass
+
+
+# reporter that crashes the import at the given created row
+def crash_at(created_row):
+    created = 0
+
+    def report(status, row_index, contact, detail=None):
+        nonlocal created
+        if status == "created":
+            created += 1
+            if created == created_row:
+                raise Crash()
+
+    return report
+
+
+def journal_entries(file_name):
+    with open(checkpoint_path(file_name), encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+# resuming twice reads every row once, and the offsets of a resumed run are the
+# ones of an uninterrupted read
+def test_resumed_reads_keep_exact_offsets(write_csv):
+    file_name = write_csv(CONTACTS)
+    full = list(read_csv_rows(file_name))
+
+    progress = {}
+    rows = read_csv_rows(file_name, progress)
+    first = [next(rows) for _ in range(10)]
+
+    resumed = {}
+    rows = read_csv_rows(file_name, resumed, progress["offset"], 10)
+    second = [next(rows) for _ in range(10)]
+
+    rest = list(read_csv_rows(file_name, {}, resumed["offset"], 20))
+    assert first + second + rest == full
+
+    uninterrupted = {}
+    rows = read_csv_rows(file_name, uninterrupted)
+    for _ in range(20):
+        next(rows)
+    assert resumed == uninterrupted
+
+
+def test_resume_after_a_crash_creates_every_contact_once(mock_server, write_csv):
+    file_name = write_csv(CONTACTS)
+
+    with pytest.raises(Crash):
+        run_import(mock_server.url, DB, UID, PASSWORD, file_name, 10, crash_at(15))
+    # the second batch was created in odoo but never committed to the journal
+    assert len(mock_server.database.tables["res.partner"]) == 20
+    assert read_checkpoint(file_name)["row_index"] == 10
+
+    statuses = {}
+
+    def report(status, row_index, contact, detail=None):
+        statuses[row_index] = status
+
+    total = run_import(
+        mock_server.url, DB, UID, PASSWORD, file_name, 10, report, resume=True
+    )
+    assert total == 15
+    assert min(statuses) == 11
+    assert [statuses[row] for row in range(11, 21)] == ["duplicate"] * 10
+    assert [statuses[row] for row in range(21, 36)] == ["created"] * 15
+
+    partners = mock_server.database.tables["res.partner"].values()
+    assert sorted(partner["email"] for partner in partners) == sorted(
+        email for _, email in CONTACTS
+    )
+    assert journal_entries(file_name)[-1]["offset"] == os.path.getsize(file_name)
+
+
+def test_journal_is_not_resumed_against_another_file(mock_server, write_csv):
+    file_name = write_csv(CONTACTS[:5])
+    run_import(mock_server.url, DB, UID, PASSWORD, file_name, 10, crash_at(0))
+    assert read_checkpoint(file_name)
+
+    write_csv(CONTACTS[:6])
+    assert read_checkpoint(file_name) is None
@@ -0,0 +1,56 @@
+import pytest
+
+from contact_index import (
+    MATCH_MODES,
+    build_contact_index,
+    canonical_email,
+    canonical_name,
+    find_in_contact_index,
+    new_contact_index,
+)
+
+PARTNERS = [
+    {"id": 1, "name": "José da Silva", "email": "Jose.Da.Silva@Gmail.com"},
+    {"id": 2, "name": "Maria Souza", "email": "maria@empresa.com.br"},
+    {"id": 3, "name": "Contato10 Teste", "email": "contato10@empresa.com.br"},
+]
+
+
+def find(mode, name, email):
+    index = build_contact_index(PARTNERS, mode)
+    return find_in_contact_index(index, {"name": name, "email": email})
+
+
+def test_canonical_keys():
+    assert canonical_name("  José   DA silva ") == "jose da silva"
+    assert canonical_email("mailto:J.Silva+news@GoogleMail.com") == "jsilva@gmail.com"
+    # only the providers that ignore them lose the dots and the +tag
+    assert canonical_email("j.silva+x@empresa.com") == "j.silva+x@empresa.com"
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        new_contact_index("soundex")
+
+
+# partner matched in the exact, normalized and fuzzy modes
+@pytest.mark.parametrize(
+    "name, email, expected",
+    [
+        # same name, or same email in any case
+        ("Maria Souza", "outra@exemplo.com", (2, 2, 2)),
+        ("Outra", "MARIA@empresa.com.br", (2, 2, 2)),
+        # accents, case and spaces of the name
+        ("jose  da silva", "", (False, 1, 1)),
+        # gmail dots and +tag
+        ("Outra", "josedasilva+x@gmail.com", (False, 1, 1)),
+        # typos only match in the fuzzy mode
+        ("Maria Sousa", "", (False, False, 2)),
+        ("Marcos Lima", "marja@empresa.com.br", (False, False, 2)),
+        # numbered contacts are never typos of each other
+        ("Contato11 Teste", "", (False, False, False)),
+        ("Pedro Alves", "pedro@exemplo.com", (False, False, False)),
+    ],
+)
+def test_matching_modes(name, email, expected):
+    assert tuple(find(mode, name, email) for mode in MATCH_MODES) == expected
@@ -0,0 +1,58 @@
+import xmlrpc.client
+
+import pytest
+
+from conftest import DB, PASSWORD, UID
+from contact_index import MATCH_MODES, find_in_contact_index
+from contact_lookup import load_dedupe_index
+from contact_mapping import row_to_contact
+
+PARTNERS = [
+    ("José da Silva", "Jose.Da.Silva@Gmail.com"),
+    ("Maria Souza", "maria@empresa.com.br"),
+    ("Carlos Lima", "carlos@empresa.com.br"),
+    ("Maria Silva", "Maria.Silva@Exemplo.COM"),
+]
+
+ROWS = [
+    ("jose  da silva", "josedasilva@gmail.com"),
+    ("Maria Souza", "outra@empresa.com.br"),
+    ("Carlos Lima", "CARLOS@empresa.com.br"),
+    ("Ana Reis", "ana@empresa.com.br"),
+    ("M. Silva", "maria.silva@exemplo.com"),
+]
+
+
+# the partner matched for every row with the dedupe index of the lookup mode
+def duplicates(mock_server, file_name, match_mode, lookup):
+    models = xmlrpc.client.ServerProxy(f"{mock_server.url}/xmlrpc/2/object")
+    index = load_dedupe_index(
+        models, DB, UID, PASSWORD, mock_server.url, file_name,
+        match_mode=match_mode, lookup=lookup,
+    )
+    return [
+        find_in_contact_index(
+            index, row_to_contact({"Nome completo": name, "E-mail": email})
+        )
+        for name, email in ROWS
+    ]
+
+
+# fetching only the partners of the csv finds the same duplicates as the snapshot
+@pytest.mark.parametrize("match_mode", MATCH_MODES)
+def test_targeted_lookup_finds_the_snapshot_duplicates(
+    mock_server, write_csv, match_mode
+):
+    for name, email in PARTNERS:
+        mock_server.database._insert("res.partner", {"name": name, "email": email})
+    file_name = write_csv(ROWS)
+
+    snapshot = duplicates(mock_server, file_name, match_mode, "snapshot")
+    targeted = duplicates(mock_server, file_name, match_mode, "targeted")
+
+    assert targeted == snapshot
+    # emails are compared in any case, also when stored in mixed case
+    assert snapshot[-1] == 4
+    if match_mode != "exact":
+        # "jose  da silva" / josedasilva@gmail.com is José da Silva
+        assert snapshot[0] == 1
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+import resilient_rpc
+from async_client import iterate_in_thread
+from conftest import DB, PASSWORD, UID
+from fingerprints import FingerprintStore
+from import_engine import import_file
+from local_cache import LocalCache
+from mock_odoo import start_mock_server
+
+CONTACTS = [(f"Contato {index}", f"contato{index}@exemplo.com") for index in range(150)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilient_rpc, "backoff_delay", lambda attempt: 0)
+
+
+# a mock server that refuses one call in ten with a 503
+@pytest.fixture
+def flaky_server():
+    server = start_mock_server(failure_rate=0.1)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# the rejected calls are retried by every strategy, so none of them loses a row
+@pytest.mark.parametrize("strategy", ["serial", "threads", "async"])
+def test_strategies_retry_rejected_calls(flaky_server, write_csv, strategy):
+    file_name = write_csv(CONTACTS)
+    statuses = []
+
+    total = import_file(
+        flaky_server.url, DB, UID, PASSWORD, file_name, strategy,
+        report=lambda status, *_: statuses.append(status), max_workers=8,
+        queue_size=4,
+    )
+
+    assert total == len(CONTACTS)
+    assert statuses == ["created"] * len(CONTACTS)
+    emails = {
+        partner["email"]
+        for partner in flaky_server.database.tables["res.partner"].values()
+    }
+    assert emails == {email for _, email in CONTACTS}
+
+
+# a delta import loads the dedupe index lazily, on the producer thread of the
+# async strategy, from the cache opened on this thread
+def test_async_delta_import_with_cache(mock_server, write_csv, tmp_path):
+    file_name = write_csv(CONTACTS)
+    statuses = []
+
+    with LocalCache(str(tmp_path / "cache.sqlite"), mock_server.url, DB) as cache:
+        with FingerprintStore(
+            str(tmp_path / "contatos.fp"), mock_server.url, DB
+        ) as fingerprints:
+            total = import_file(
+                mock_server.url, DB, UID, PASSWORD, file_name, "async",
+                report=lambda status, *_: statuses.append(status),
+                cache=cache, fingerprints=fingerprints,
+            )
+
+    assert total == len(CONTACTS)
+    assert statuses == ["created"] * len(CONTACTS)
+
+
+# the contacts are produced off the event loop, and an error of the generator
+# reaches the loop after the items produced before it
+def test_iterate_in_thread():
+    loop_thread = threading.get_ident()
+    producers = set()
+
+    def contacts():
+        for index in range(5):
+            producers.add(threading.get_ident())
+            yield index
+        raise ValueError("linha inválida")
+
+    async def consume():
+        received = []
+        with pytest.raises(ValueError):
+            async for item in iterate_in_thread(contacts(), 2):
+                received.append(item)
+        return received
+
+    assert asyncio.run(consume()) == [0, 1, 2, 3, 4]
+    assert loop_thread not in producers
@@ -0,0 +1,65 @@
+import json
+
+from conftest import DB, PASSWORD, UID
+from import_plan import apply_plan, build_plan, read_plan_header
+
+
+def insert_partner(mock_server, **vals):
+    return mock_server.database._insert("res.partner", vals)
+
+
+# a plan with the company stage: the header records it with the batch size, the
+# upserts diff parent_id, and the apply step sends exactly the estimated rpcs
+def test_plan_with_companies(mock_server, write_csv, tmp_path):
+    old_company = insert_partner(mock_server, name="Antiga", is_company=True)
+    ana = insert_partner(mock_server, name="Ana Souza", email="ana@exemplo.com")
+    file_name = write_csv(
+        [
+            ("Ana Souza", "ana@exemplo.com", "", "Antiga"),
+            ("Bruno Lima", "bruno@exemplo.com", "", "Nova"),
+            ("Carla Dias", "carla@exemplo.com", "", "Nova"),
+            ("Davi Reis", "davi@exemplo.com", "", "Outra"),
+        ]
+    )
+    plan_file = str(tmp_path / "plano.jsonl")
+
+    summary = build_plan(
+        mock_server.url, DB, UID, PASSWORD, file_name, plan_file, 2,
+        upsert=True, companies=True,
+    )
+
+    header = read_plan_header(plan_file)
+    assert header["companies"] is True
+    assert header["batch_size"] == 2
+    assert summary["rows"]["create"] == 3
+    assert summary["rows"]["update"] == 1
+    # batch 1: search, create Nova, create, write; batch 2: search, create Outra, create
+    assert summary["estimated_rpcs"] == 7
+    with open(plan_file, encoding="utf-8") as file:
+        entries = [json.loads(line) for line in file.readlines()[1:]]
+    [update] = [entry for entry in entries if entry["action"] == "update"]
+    assert update["changes"]["parent_id"] == old_company
+
+    reports = []
+    before = mock_server.stats()["rpc_count"]
+    total = apply_plan(
+        mock_server.url, DB, UID, PASSWORD, plan_file,
+        lambda status, *_: reports.append(status),
+    )
+
+    assert total == 4
+    assert sorted(reports) == ["created"] * 3 + ["updated"]
+    assert mock_server.stats()["rpc_count"] - before == summary["estimated_rpcs"]
+    partners = mock_server.database.tables["res.partner"]
+    parents = {
+        partner["email"]: partners[partner["parent_id"]]["name"]
+        for partner in partners.values()
+        if partner.get("parent_id")
+    }
+    assert parents == {
+        "ana@exemplo.com": "Antiga",
+        "bruno@exemplo.com": "Nova",
+        "carla@exemplo.com": "Nova",
+        "davi@exemplo.com": "Outra",
+    }
+    assert partners[ana]["parent_id"] == old_company
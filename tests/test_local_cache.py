@@ -0,0 +1,41 @@
+import hashlib
+import sqlite3
+
+from local_cache import LocalCache
+
+
+# the uid keys are salted per cache file and stable across runs
+def test_auth_keys_are_salted_per_file(tmp_path):
+    url = "http://odoo"
+    with LocalCache(str(tmp_path / "a.sqlite"), url, "db") as cache:
+        key = cache.auth_key("admin", "senha")
+        cache.set(key, 2)
+    with LocalCache(str(tmp_path / "b.sqlite"), url, "db") as other:
+        assert other.auth_key("admin", "senha") != key
+
+    with LocalCache(str(tmp_path / "a.sqlite"), url, "db") as cache:
+        assert cache.auth_key("admin", "senha") == key
+        assert cache.get(key) == 2
+        assert cache.get(cache.auth_key("admin", "outra")) is None
+
+    unsalted = hashlib.sha256(b"admin\0senha").hexdigest()
+    assert unsalted not in key
+
+
+# the uids cached under the old unsalted keys are dropped
+def test_unsalted_auth_keys_are_dropped(tmp_path):
+    file_name = str(tmp_path / "cache.sqlite")
+    connection = sqlite3.connect(file_name)
+    with connection:
+        connection.execute(
+            "CREATE TABLE cache (url TEXT, db TEXT, name TEXT, version INTEGER, "
+            "saved_at REAL, value TEXT, PRIMARY KEY (url, db, name))"
+        )
+        connection.execute(
+            "INSERT INTO cache VALUES ('http://odoo', 'db', 'auth:abc', 1, 0, '2')"
+        )
+    connection.close()
+
+    with LocalCache(file_name, "http://odoo", "db") as cache:
+        rows = cache.connection.execute("SELECT name FROM cache").fetchall()
+    assert rows == []
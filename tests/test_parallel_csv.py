@@ -0,0 +1,68 @@
+import pytest
+
+from contact_mapping import row_to_contact
+from parallel_csv import iter_record_boundaries, read_contacts_parallel, read_header
+from pipeline import read_csv_rows
+
+ROWS = [
+    ("Ana", "ana@exemplo.com", "Analista"),
+    ("Bruno", "bruno@exemplo.com", 'Diretor "comercial"'),
+    ("Carla", "carla@exemplo.com", "Linha 1\nLinha 2\n\nLinha 4"),
+    ("Davi", "davi@exemplo.com", 'aspas "" e\r\nquebra'),
+    ("Élida", "elida@exemplo.com", "São Paulo, SP"),
+    ("", "", ""),
+    ("Fábio", "fabio@exemplo.com", "\n"),
+]
+
+
+# the rows of the serial reader, as (row_index, values of the contact)
+def serial_rows(file_name):
+    return [
+        (row_index, row_to_contact(row).to_list())
+        for row_index, row in read_csv_rows(file_name)
+    ]
+
+
+def parallel_rows(file_name, chunk_size):
+    return [
+        (row_index, contact.to_list())
+        for row_index, contact in read_contacts_parallel(file_name, 2, chunk_size)
+    ]
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 20])
+def test_parallel_reader_matches_the_serial_reader(write_csv, newline, chunk_size):
+    file_name = write_csv(ROWS * 3, newline=newline)
+    assert parallel_rows(file_name, chunk_size) == serial_rows(file_name)
+
+
+# every boundary falls right after a record, never inside a quoted field
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_boundaries_split_between_records(write_csv, newline):
+    file_name = write_csv(ROWS, newline=newline)
+    _, header_end = read_header(file_name)
+    with open(file_name, "rb") as file:
+        data = file.read()
+
+    expected = serial_rows(file_name)
+    for chunk_size in range(1, 40):
+        boundaries = list(iter_record_boundaries(file_name, header_end, chunk_size))
+        assert boundaries[0] == header_end
+        assert boundaries[-1] == len(data)
+        for boundary in boundaries[1:-1]:
+            assert data[boundary - 1 : boundary] == b"\n"
+        assert parallel_rows(file_name, chunk_size) == expected
+
+
+def test_blank_lines_are_not_records(tmp_path, write_csv):
+    file_name = write_csv([("Ana", "ana@exemplo.com")])
+    with open(file_name, "a", encoding="utf-8") as file:
+        file.write("\n\nBia,bia@exemplo.com\n\n")
+
+    rows = serial_rows(file_name)
+    assert [(row_index, values[0]) for row_index, values in rows] == [
+        (1, "Ana"),
+        (2, "Bia"),
+    ]
+    assert parallel_rows(file_name, 1) == rows
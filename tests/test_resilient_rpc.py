@@ -0,0 +1,107 @@
+import xmlrpc.client
+
+import pytest
+
+import resilient_rpc
+from batch_create import create_partners_batch
+from conftest import DB, PASSWORD, UID
+from contact_mapping import row_to_contact
+from mock_odoo import MockOdooDatabase
+from resilient_rpc import AdaptiveLimiter, ResilientModels
+
+
+def bad_gateway():
+    return xmlrpc.client.ProtocolError("http://odoo", 502, "Bad Gateway", {})
+
+
+def unavailable():
+    return xmlrpc.client.ProtocolError("http://odoo", 503, "Unavailable", {})
+
+
+# models backed by the mock database that raise the queued errors: before running
+# the call (lost=False) or after committing it (lost=True, a lost response)
+class FlakyModels:
+    def __init__(self):
+        self.database = MockOdooDatabase()
+        self.errors = []
+        self.calls = []
+
+    def execute_kw(self, db, uid, password, model, method, args, kwargs=None):
+        self.calls.append(method)
+        error, lost = self.errors.pop(0) if self.errors else (None, False)
+        if error and not lost:
+            raise error
+        result = self.database.execute_kw(model, method, args, kwargs)
+        if error:
+            raise error
+        return result
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilient_rpc, "backoff_delay", lambda attempt: 0)
+
+
+def call(models, method, args):
+    return models.execute_kw(DB, UID, PASSWORD, "res.partner", method, args)
+
+
+def test_reads_are_retried_after_a_lost_response():
+    flaky = FlakyModels()
+    flaky.errors = [(bad_gateway(), True)]
+
+    assert call(ResilientModels(flaky), "search_count", [[]]) == 0
+    assert flaky.calls == ["search_count", "search_count"]
+
+
+def test_creates_are_not_retried_after_a_lost_response():
+    flaky = FlakyModels()
+    flaky.errors = [(bad_gateway(), True)]
+
+    with pytest.raises(xmlrpc.client.ProtocolError):
+        call(ResilientModels(flaky), "create", [[{"name": "A", "email": "a@x.com"}]])
+    assert flaky.calls == ["create"]
+    assert len(flaky.database.tables["res.partner"]) == 1
+
+
+def test_rejected_creates_are_retried():
+    flaky = FlakyModels()
+    flaky.errors = [(unavailable(), False), (ConnectionRefusedError(), False)]
+
+    ids = call(ResilientModels(flaky), "create", [[{"name": "A", "email": "a@x.com"}]])
+    assert flaky.calls == ["create"] * 3
+    assert ids == [1]
+
+
+def test_a_lost_batch_is_recovered_without_duplicates():
+    flaky = FlakyModels()
+    flaky.errors = [(ConnectionResetError(), True)]
+    contacts = [
+        row_to_contact({"Nome completo": f"C{index}", "E-mail": f"c{index}@x.com"})
+        for index in range(4)
+    ]
+
+    results = create_partners_batch(
+        ResilientModels(flaky), DB, UID, PASSWORD, contacts
+    )
+
+    assert flaky.calls == ["create", "search_read"]
+    assert [error for _, _, error in results] == [None] * 4
+    partners = flaky.database.tables["res.partner"]
+    assert len(partners) == 4
+    assert [partners[partner_id]["email"] for _, partner_id, _ in results] == [
+        contact.email for contact in contacts
+    ]
+
+
+def test_only_the_writes_drive_the_limiter():
+    flaky = FlakyModels()
+    limiter = AdaptiveLimiter(batch_size=100, batch_step=50, target_latency=0)
+    models = ResilientModels(flaky, limiter)
+
+    call(models, "search_read", [[]])
+    assert limiter.current_batch_size() == 100
+
+    # over the (zero) target latency: halved
+    call(models, "create", [[{"name": "A", "email": "a@x.com"}]])
+    assert limiter.current_batch_size() == 50
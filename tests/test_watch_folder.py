@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from conftest import DB, PASSWORD, UID
+from watch_folder import DONE_FOLDER, FAILED_FOLDER, ImportSession, import_dropped_file
+
+
+@pytest.fixture
+def session(mock_server):
+    session = ImportSession(mock_server.url, DB, UID, PASSWORD)
+    session.load()
+    return session
+
+
+def failing_refresh(session, error):
+    refresh = session.refresh
+
+    def fail():
+        session.refresh = refresh
+        raise error
+
+    session.refresh = fail
+
+
+# an odoo outage leaves the file for the next poll, which imports it
+def test_transient_errors_keep_the_file(session, mock_server, write_csv, tmp_path):
+    file_name = write_csv([("Ana Souza", "ana@exemplo.com")])
+    failing_refresh(session, ConnectionRefusedError("Odoo fora do ar"))
+
+    assert import_dropped_file(session, file_name, str(tmp_path), {}) is None
+    assert os.path.exists(file_name)
+
+    assert import_dropped_file(session, file_name, str(tmp_path), {}) == DONE_FOLDER
+    assert os.path.exists(tmp_path / DONE_FOLDER / "contatos.csv")
+    assert len(mock_server.database.tables["res.partner"]) == 1
+
+
+# a fatal error moves the file to the error folder
+def test_fatal_errors_move_the_file(session, write_csv, tmp_path):
+    file_name = write_csv([("Ana Souza", "ana@exemplo.com")])
+    failing_refresh(session, ValueError("CSV inválido"))
+
+    assert import_dropped_file(session, file_name, str(tmp_path), {}) == FAILED_FOLDER
+    assert not os.path.exists(file_name)
+    assert os.path.exists(tmp_path / FAILED_FOLDER / "contatos.csv")
@@ -0,0 +1,75 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import MeteredServerProxy
+
+# per-thread storage for the worker connections
+_worker_state = threading.local()
+
+
+# return the persistent connection of the current worker (one per thread and url).
+# ServerProxy is not thread-safe, but its transport keeps the HTTP/1.1 connection
+# alive between calls, so each worker reuses its own socket for every request.
+def get_worker_models(url):
+    connections = getattr(_worker_state, "connections", None)
+    if connections is None:
+        connections = _worker_state.connections = {}
+
+    if url not in connections:
+        connections[url] = MeteredServerProxy(f"{url}/xmlrpc/2/object")
+    return connections[url]
+
+
+# run the task with the connection of the current worker, holding one of the
+# limiter slots (adaptive concurrency) when there is a limiter
+def _run_task(url, task, item, limiter=None):
+    if not limiter:
+        return task(get_worker_models(url), item)
+
+    limiter.acquire()
+    try:
+        return task(get_worker_models(url), item)
+    finally:
+        limiter.release()
+
+
+# unpack a finished future into (item, result, error)
+def _collect(item, future):
+    try:
+        return item, future.result(), None
+    except Exception as e:
+        return item, None, e
+
+
+# run task(models, item) for every item on max_workers threads and yield
+# (item, result, error) for each one as it finishes. At most queue_size items are
+# queued or running at once, so a fast producer blocks instead of filling memory.
+# With a limiter, max_workers is only the ceiling: the limiter decides how many of
+# the workers call odoo at the same time.
+def upload_concurrently(
+    url, task, items, max_workers=10, queue_size=None, limiter=None
+):
+    queue_size = queue_size or max_workers * 2
+    free_slots = threading.BoundedSemaphore(queue_size)
+    finished = queue.Queue()
+
+    # release the slot and hand the future back to the consumer thread
+    def on_done(future, item):
+        free_slots.release()
+        finished.put((item, future))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = 0
+        for item in items:
+            free_slots.acquire()
+            future = executor.submit(_run_task, url, task, item, limiter)
+            future.add_done_callback(lambda f, item=item: on_done(f, item))
+            pending += 1
+
+            while not finished.empty():
+                yield _collect(*finished.get())
+                pending -= 1
+
+        while pending:
+            yield _collect(*finished.get())
+            pending -= 1
@@ -0,0 +1,170 @@
+import logging
+import os
+import shutil
+import threading
+from checkpoint import checkpoint_path
+from contact_index import add_to_contact_index, new_contact_index
+from get_ids import iter_existing_contacts
+from import_engine import import_file
+from input_stream import CSV_EXTENSIONS
+from instrumentation import MeteredServerProxy, metrics
+from partner_snapshot import SNAPSHOT_FIELDS
+from reference_data import load_reference_data
+from resilient_rpc import ResilientModels, is_retryable
+from row_report import RowReport
+
+logger = logging.getLogger(__name__)
+
+# folders created inside the watched folder for the imported and failed files
+DONE_FOLDER = "processados"
+FAILED_FOLDER = "erros"
+
+
+# warm state of the daemon, shared by every file: the dedupe index and the
+# reference tables are loaded once and kept up to date with the partners created
+# by the imports (recording) and the ones changed in odoo meanwhile (refresh,
+# one search_read by write_date before each file)
+class ImportSession:
+    def __init__(self, url, db, uid, password, match_mode="exact", page_size=5000):
+        self.url = url
+        self.db = db
+        self.uid = uid
+        self.password = password
+        self.page_size = page_size
+        self.models = ResilientModels(MeteredServerProxy(f"{url}/xmlrpc/2/object"))
+        self.contact_index = new_contact_index(match_mode)
+        self.last_write_date = ""
+        self.reference_data = None
+
+    # load the reference tables and every partner
+    def load(self, cache=None):
+        self.reference_data = load_reference_data(
+            self.models, self.db, self.uid, self.password, cache
+        )
+        with metrics.timed("get_existing_contacts"):
+            self.sync(None)
+
+    # add the partners of the domain to the index (None: every partner)
+    def sync(self, domain):
+        for partner in iter_existing_contacts(
+            self.models, self.db, self.uid, self.password, domain, SNAPSHOT_FIELDS,
+            self.page_size,
+        ):
+            if partner["name"] and partner["email"]:
+                add_to_contact_index(self.contact_index, partner, partner["id"])
+            write_date = partner.get("write_date")
+            if write_date and write_date > self.last_write_date:
+                self.last_write_date = write_date
+
+    # add the partners created or changed in odoo since the last sync. Renamed and
+    # deleted partners keep their old keys until the daemon restarts.
+    def refresh(self):
+        self.sync([("write_date", ">=", self.last_write_date)])
+
+    # reporter that adds the partners created by the import to the index
+    def recording(self, report):
+        def record(status, row_index, contact, detail=None):
+            if status == "created":
+                add_to_contact_index(self.contact_index, contact, detail)
+            report(status, row_index, contact, detail)
+
+        return record
+
+
+# csv files (also compressed) of the folder whose size and mtime did not change
+# since the last poll (still being copied otherwise); sizes keeps the last seen
+# (size, mtime) by file
+def ready_files(folder, sizes):
+    ready = []
+    current = {}
+    for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+        if not entry.is_file() or not entry.name.lower().endswith(CSV_EXTENSIONS):
+            continue
+        stat = entry.stat()
+        current[entry.path] = (stat.st_size, stat.st_mtime)
+        if sizes.get(entry.path) == current[entry.path]:
+            ready.append(entry.path)
+
+    sizes.clear()
+    sizes.update(current)
+    return ready
+
+
+# move the file (and its checkpoint journal) to the folder, keeping the old ones
+def move_file(file_name, folder):
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, os.path.basename(file_name))
+    if os.path.exists(target):
+        root, extension = os.path.splitext(target)
+        target = f"{root}.{int(os.path.getmtime(file_name))}{extension}"
+    shutil.move(file_name, target)
+
+    if os.path.exists(checkpoint_path(file_name)):
+        shutil.move(checkpoint_path(file_name), checkpoint_path(target))
+    return target
+
+
+# import one file with the warm session; the rows go to an ndjson report next to
+# the processed file. A transient error (odoo down or overloaded after the
+# retries) leaves the file in place, so the next poll imports it again; the
+# partners created meanwhile are already in the session index. Returns the
+# folder the file was moved to, or None when it stays.
+def import_dropped_file(session, file_name, folder, options, fingerprints=None):
+    report_file = os.path.join(
+        folder, DONE_FOLDER, f"{os.path.basename(file_name)}.ndjson"
+    )
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+
+    logger.info(f"Importando {file_name}")
+    try:
+        session.refresh()
+        with RowReport(report_file) as report:
+            total = import_file(
+                session.url,
+                session.db,
+                session.uid,
+                session.password,
+                file_name,
+                report=session.recording(report),
+                fingerprints=fingerprints,
+                contact_index=session.contact_index,
+                reference_data=session.reference_data,
+                **options,
+            )
+        logger.info(f"{file_name}: {total} contatos enviados ao Odoo")
+        target = DONE_FOLDER
+
+    except Exception as e:
+        if is_retryable(e):
+            logger.warning(
+                f"Odoo indisponível ao importar {file_name} ({e}); nova tentativa "
+                f"na próxima verificação"
+            )
+            target = None
+        else:
+            logger.error(f"Erro ao importar {file_name}: {e}")
+            target = FAILED_FOLDER
+
+    finally:
+        if fingerprints:
+            fingerprints.save()
+
+    if target:
+        move_file(file_name, os.path.join(folder, target))
+    return target
+
+
+# daemon mode: poll the folder every interval seconds and import every csv that
+# shows up, in name order, until stop (a threading.Event) is set. Authentication,
+# reference tables and dedupe index are loaded once for all the files.
+def watch_folder(
+    session, folder, options, interval=5.0, stop=None, fingerprints=None
+):
+    stop = stop or threading.Event()
+    logger.info(f"Aguardando arquivos CSV em {folder}")
+    sizes = {}
+    while not stop.is_set():
+        for file_name in ready_files(folder, sizes):
+            import_dropped_file(session, file_name, folder, options, fingerprints)
+            sizes.pop(file_name, None)
+        stop.wait(interval)